@@ -0,0 +1,93 @@
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def idempotent(view):
+    """
+    Honour the ``Idempotency-Key`` header on a write action of an authenticated
+    user: the first request runs and its response is stored, retries with the
+    same key get that response back (``Idempotent-Replayed: true``) without
+    running the action again.
+
+    A retry arriving while the first request still runs gets 409, a key reused
+    for a different request gets 422. Server errors are not stored, the client
+    may retry them with the same key.
+
+    While the first request runs, its key is only leased for
+    IDEMPOTENCY_LEASE seconds. If the worker dies before storing the response,
+    a retry after the lease takes the key over and runs the action.
+    """
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'detail': f'{HEADER} is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = hashlib.sha256(
+            b'\n'.join([request.method.encode(), request.get_full_path().encode(), request.body])
+        ).hexdigest()
+        now = timezone.now()
+
+        stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if stored is not None and stored.expires_at > now:
+            return replay(stored, request_hash)
+        if stored is not None:
+            # Expired, or the lease of a request that never finished: take it over
+            IdempotencyKey.objects.filter(pk=stored.pk, expires_at__lte=now).delete()
+
+        try:
+            with transaction.atomic():
+                stored = IdempotencyKey.objects.create(
+                    user=request.user, key=key, request_hash=request_hash,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_LEASE),
+                )
+        except IntegrityError:
+            # Another request with the same key got there first
+            return in_progress()
+
+        try:
+            response = view(self, request, *args, **kwargs)
+        except Exception:
+            stored.delete()
+            raise
+        if response.status_code >= 500 or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            # Not an outcome, the client may retry with the same key
+            stored.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=stored.pk).update(
+                status_code=response.status_code, response=response.data,
+                expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+        return response
+    return wrapper
+
+
+def replay(stored, request_hash):
+    if stored.request_hash != request_hash:
+        return Response(
+            {'detail': f'This {HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if stored.status_code is None:
+        return in_progress()
+    return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def in_progress():
+    return Response(
+        {'detail': f'A request with this {HEADER} is still being processed.'},
+        status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'},
+    )
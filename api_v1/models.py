@@ -1,21 +1,49 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
 from shop.models import Product
 
+LINE_TOTAL = DecimalField(max_digits=12, decimal_places=2)
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate carts with their total price and number of lines, computed in SQL.
+        """
+        return self.annotate(
+            items_total_price=Coalesce(
+                Sum(F('items__quantity') * F('items__product__price'), output_field=LINE_TOTAL),
+                Value(Decimal('0.00')), output_field=LINE_TOTAL,
+            ),
+            items_count=Count('items'),
+        )
+
+
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f'Cart of {self.user.username}'
 
+    # Both totals prefer the values annotated by with_totals()
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        if hasattr(self, 'items_total_price'):
+            return self.items_total_price
+        return Cart.objects.with_totals().values_list('items_total_price', flat=True).get(pk=self.pk)
 
     @property
     def total_items(self):
+        if hasattr(self, 'items_count'):
+            return self.items_count
         return self.items.count()
 
 class CartItem(models.Model):
@@ -31,4 +59,29 @@ class CartItem(models.Model):
 
     @property
     def total_price(self):
-        return self.quantity * self.product.price
\ No newline at end of file
+        return self.quantity * self.product.price
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for an ``Idempotency-Key`` header, replayed to retries of
+    the same request until ``expires_at``, see api_v1/idempotency.py.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    # Hash of the method, path and body the key was first used with
+    request_hash = models.CharField(max_length=64)
+    # Null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    # Encoded like the JSON renderer does, so replays match the original body
+    response = models.JSONField(null=True, encoder=JSONEncoder)
+    created = models.DateTimeField(auto_now_add=True)
+    # End of the lease while the first request runs, then of the replays
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return self.key
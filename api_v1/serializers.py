@@ -2,6 +2,9 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from users.models import User, Address
 from shop.models import Product, Category, Brand, Review, Wishlist
+from shop.images import FORMATS, variant_url, variant_urls
+from shop.wishlist import get_wishlist_product_ids
+from inventory.shards import reset_stock
 from .models import Cart, CartItem
 from orders.models import Order, OrderItem
 
@@ -77,6 +80,50 @@ class AddressSerializer(serializers.ModelSerializer):
         fields = ('id', 'full_name', 'address_line_1', 'address_line_2', 'city', 'state', 'postal_code', 'country', 'is_default')
         read_only_fields = ('user',)
 
+class SparseFieldsetMixin:
+    """
+    Lets clients shape GET responses: ``?fields=a,b`` returns only those fields,
+    ``?expand=c`` adds fields listed in ``Meta.expandable_fields`` to the default
+    set. Only the top-level serializer of a response is shaped, nested ones
+    always render the default set.
+    """
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        declared = list(cls.Meta.fields)
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        if request is None or request.method != 'GET':
+            return set(declared)
+        fields = _split_param(request.query_params.get('fields'))
+        if fields:
+            return fields & set(declared)
+        expand = _split_param(request.query_params.get('expand')) & expandable
+        return {name for name in declared if name not in expandable} | expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if root is self or (root is self.parent and isinstance(root, serializers.ListSerializer)):
+            requested = self.get_requested_fields(self.context.get('request'))
+        else:
+            requested = self.get_requested_fields(None) - set(getattr(self.Meta, 'expandable_fields', ()))
+        for name in list(fields):
+            if name not in requested:
+                fields.pop(name)
+        return fields
+
+
+def _split_param(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+def image_variant_urls(image, request=None):
+    urls = variant_urls(image)
+    if request:
+        for variant in urls.values():
+            for ext in FORMATS:
+                variant[ext] = request.build_absolute_uri(variant[ext])
+    return urls
+
 # --- New Serializers for Shop App ---
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -97,12 +144,14 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'user', 'rating', 'comment', 'advantages', 'disadvantages', 'created']
         read_only_fields = ['user', 'product'] # Product will be set by the view
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     brand = BrandSerializer(read_only=True)
     reviews = ReviewSerializer(many=True, read_only=True) # Nested reviews
     # Add a field to check if the product is in the user's wishlist
     is_in_wishlist = serializers.SerializerMethodField()
+    rating_histogram = serializers.ReadOnlyField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -117,22 +166,102 @@ class ProductSerializer(serializers.ModelSerializer):
             'created',
             'updated',
             'image',
+            'images',
             'category',
             'brand',
             'seller',
+            'avg_rating',
+            'review_count',
+            'rating_histogram',
             'reviews',
             'is_in_wishlist',
         ]
-        read_only_fields = ['seller'] # Seller will be set by the view for creation/update
+        read_only_fields = ['seller', 'avg_rating', 'review_count'] # Seller will be set by the view for creation/update
+
+    def get_is_in_wishlist(self, obj):
+        request = self.context.get('request')
+        if request:
+            return obj.id in get_wishlist_product_ids(request)
+        return False
+
+    def get_images(self, obj):
+        return image_variant_urls(obj.image, self.context.get('request'))
+
+    def update(self, instance, validated_data):
+        stock = validated_data.pop('stock', None) if instance.stock_sharded else None
+        instance = super().update(instance, validated_data)
+        if stock is not None:
+            # Sharded stock is kept in inventory.StockShard
+            reset_stock(instance.pk, stock)
+            instance.refresh_from_db(fields=['stock', 'updated'])
+        return instance
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'stock' in data:
+            data['stock'] = instance.available_stock
+        return data
+
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Compact product representation for list responses.
+    """
+    category = CategorySerializer(read_only=True)
+    brand = BrandSerializer(read_only=True)
+    reviews = ReviewSerializer(many=True, read_only=True)
+    thumbnail = serializers.SerializerMethodField()
+    is_in_wishlist = serializers.SerializerMethodField()
+    rating_histogram = serializers.ReadOnlyField()
+    images = serializers.SerializerMethodField()
+    stock = serializers.ReadOnlyField(source='available_stock')
+
+    class Meta:
+        model = Product
+        fields = [
+            'id',
+            'name',
+            'slug',
+            'price',
+            'thumbnail',
+            'avg_rating',
+            'review_count',
+            'is_in_wishlist',
+            # Only with ?expand= or ?fields=
+            'description',
+            'stock',
+            'available',
+            'created',
+            'updated',
+            'image',
+            'images',
+            'category',
+            'brand',
+            'seller',
+            'rating_histogram',
+            'reviews',
+        ]
+        expandable_fields = [
+            'description', 'stock', 'available', 'created', 'updated', 'image', 'images',
+            'category', 'brand', 'seller', 'rating_histogram', 'reviews',
+        ]
+        read_only_fields = fields
+
+    def get_thumbnail(self, obj):
+        url = variant_url(obj.image, 'thumbnail')
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request and url else url
+
+    def get_images(self, obj):
+        return image_variant_urls(obj.image, self.context.get('request'))
 
     def get_is_in_wishlist(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Wishlist.objects.filter(user=request.user, product=obj).exists()
+        if request:
+            return obj.id in get_wishlist_product_ids(request)
         return False
 
 class WishlistSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True) # Nested product details
+    product = ProductListSerializer(read_only=True) # Nested product details
 
     class Meta:
         model = Wishlist
@@ -142,7 +271,7 @@ class WishlistSerializer(serializers.ModelSerializer):
 # --- Cart Serializers ---
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True) # Nested product details
+    product = ProductListSerializer(read_only=True) # Compact product details
     product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), source='product', write_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
@@ -160,18 +289,60 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['id', 'items', 'total_price', 'total_items']
         read_only_fields = ['user']
 
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'add' and attrs['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': 'Must be at least 1 for "add".'})
+        return attrs
+
+class CartBatchSerializer(serializers.Serializer):
+    """
+    Applies a list of cart operations in order:
+    ``add`` increases the quantity, ``set`` replaces it (0 removes the line),
+    ``remove`` deletes the line.
+    """
+    MAX_OPERATIONS = 200
+
+    operations = CartOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, operations):
+        if len(operations) > self.MAX_OPERATIONS:
+            raise serializers.ValidationError(f'At most {self.MAX_OPERATIONS} operations per request.')
+        product_ids = {operation['product_id'] for operation in operations}
+        found = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(f'Products not found: {", ".join(map(str, missing))}.')
+        return operations
+
 # --- Order Serializers ---
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True) # Nested product details
+    product = ProductListSerializer(read_only=True) # Compact product details, null once deleted
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'price', 'quantity', 'get_cost']
+        fields = ['id', 'product', 'product_name', 'price', 'quantity', 'get_cost']
+
+class SellerOrderItemSerializer(serializers.ModelSerializer):
+    order_number = serializers.CharField(source='order.order_number', read_only=True)
+    paid = serializers.BooleanField(source='order.paid', read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = [
+            'id', 'order_id', 'order_number', 'paid', 'created',
+            'product_id', 'product_name', 'product_slug', 'price', 'quantity',
+        ]
+        read_only_fields = fields
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
-    address = AddressSerializer(read_only=True) # Nested address details
+    address = serializers.CharField(read_only=True) # Copied from the chosen address
     address_id = serializers.PrimaryKeyRelatedField(queryset=Address.objects.all(), source='address', write_only=True)
 
     class Meta:
@@ -179,10 +350,29 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'order_number', 'total_price', 'full_name', 'email', 'phone',
             'address', 'address_id', 'postal_code', 'city', 'country', 'notes',
-            'payment_method', 'created', 'paid', 'items'
+            'payment_method', 'created', 'paid', 'item_count', 'items'
         ]
-        read_only_fields = ['user', 'order_number', 'total_price', 'created', 'paid']
+        read_only_fields = ['user', 'order_number', 'total_price', 'created', 'paid', 'item_count']
 
     def create(self, validated_data):
         # This create method will be handled by the view, which will take items from the cart
-        pass
\ No newline at end of file
+        pass
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """
+    Order lists: read from the order row alone, without its items.
+    """
+    lead_item_thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'total_price', 'created', 'paid',
+            'item_count', 'lead_item_name', 'lead_item_thumbnail',
+        ]
+        read_only_fields = fields
+
+    def get_lead_item_thumbnail(self, obj):
+        url = variant_url(obj.lead_item_image, 'thumbnail')
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request and url else url
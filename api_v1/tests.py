@@ -1,3 +1,109 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from orders.admission import CheckoutBusy
+from orders.models import Order
+from shop.models import Brand, Category, Product
+from users.models import Address, User
+from .idempotency import idempotent
+from .models import IdempotencyKey
+
+
+class ProductRetrieveTests(TestCase):
+
+    def setUp(self):
+        seller = User.objects.create_user(username='seller', email='seller@example.com', password='p', is_seller=True)
+        self.product = Product.objects.create(
+            seller=seller, category=Category.objects.create(name='Shoes', slug='shoes'),
+            brand=Brand.objects.create(name='Acme', slug='acme'), name='Shoe', slug='shoe', price=10, stock=5,
+        )
+        self.client = APIClient()
+
+    def test_retrieve(self):
+        response = self.client.get(f'/api/v1/products/{self.product.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['slug'], 'shoe')
+
+    def test_lookup_that_is_not_an_id_is_not_found(self):
+        for pk in ('abc', '1.5', '999999'):
+            self.assertEqual(self.client.get(f'/api/v1/products/{pk}/').status_code, 404)
+
+
+class IdempotencyTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        seller = User.objects.create_user(username='seller', email='seller@example.com', password='p', is_seller=True)
+        self.product = Product.objects.create(
+            seller=seller, category=Category.objects.create(name='Shoes', slug='shoes'),
+            brand=Brand.objects.create(name='Acme', slug='acme'), name='Shoe', slug='shoe', price=10, stock=5,
+        )
+        address = Address.objects.create(
+            user=self.user, address_line_1='1 Main St', city='City', state='State', postal_code='1', country='Country',
+        )
+        self.order = {
+            'address_id': address.pk, 'full_name': 'Buyer', 'email': 'buyer@example.com', 'phone': '1',
+            'postal_code': '1', 'city': 'City', 'country': 'Country', 'payment_method': 'card',
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.post('/api/v1/cart/add_item/', {'product_id': self.product.pk, 'quantity': 2}, format='json')
+
+    def place_order(self, key, data=None):
+        return self.client.post('/api/v1/orders/', data or self.order, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response_without_second_order(self):
+        first = self.place_order('order-1')
+        self.assertEqual(first.status_code, 201)
+        # The cart is empty now: running the action again would fail
+        retry = self.place_order('order-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self.assertEqual(self.place_order('order-1').status_code, 201)
+        response = self.place_order('order-1', {**self.order, 'notes': 'Leave at the door'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def test_busy_checkout_is_not_stored(self):
+        with mock.patch('api_v1.views.checkout_slot', side_effect=CheckoutBusy(7, 3)):
+            self.assertEqual(self.place_order('order-1').status_code, 429)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.place_order('order-1').status_code, 201)
+
+    def test_server_error_is_not_stored(self):
+        status_codes = iter([503, 200])
+
+        class View:
+            @idempotent
+            def post(self, request):
+                return Response({}, status=next(status_codes))
+
+        request = RequestFactory().post('/flaky/', HTTP_IDEMPOTENCY_KEY='flaky-1')
+        request.user = self.user
+        self.assertEqual(View().post(request).status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(View().post(request).status_code, 200)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+    def test_unfinished_request_is_taken_over_after_its_lease(self):
+        # The worker dies before storing the response
+        with mock.patch('api_v1.views.create_order', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.place_order('order-1')
+        self.assertIsNone(IdempotencyKey.objects.get(key='order-1').status_code)
+        self.assertEqual(self.place_order('order-1').status_code, 409)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.place_order('order-1').status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get(key='order-1').status_code, 201)
@@ -8,7 +8,7 @@ from .views import (
     CategoryViewSet, BrandViewSet, ProductViewSet,
     ReviewViewSet, WishlistViewSet,
     CartViewSet,
-    OrderViewSet
+    OrderViewSet, SellerOrderItemViewSet
 )
 
 app_name = 'api_v1'
@@ -21,6 +21,7 @@ router.register(r'products', ProductViewSet, basename='product')
 router.register(r'wishlist', WishlistViewSet, basename='wishlist')
 router.register(r'cart', CartViewSet, basename='cart')
 router.register(r'orders', OrderViewSet, basename='order')
+router.register(r'seller/order-items', SellerOrderItemViewSet, basename='seller-order-item')
 
 # Nested router for reviews under products
 products_router = routers.NestedDefaultRouter(router, r'products', lookup='product')
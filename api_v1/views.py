@@ -1,18 +1,37 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from users.models import User, Address
 from shop.models import Product, Category, Brand, Review, Wishlist
+from shop.conditional import (
+    collection_fingerprint, make_etag, not_modified, set_validators, wishlist_fingerprint,
+)
+from shop.navigation import get_navigation_version
+from shop.pagination import SORT_ORDERINGS, get_sort_key
+from shop.search import search_products
+from shop.wishlist import add_to_wishlist
+from cart.cart import Cart as CartService
 from orders.models import Order, OrderItem # Added for Order
+from orders import admission
+from orders.admission import CheckoutBusy, checkout_slot
+from orders.services import EmptyCartError, create_order
+from inventory.services import InsufficientStock
 from .models import Cart, CartItem
+from .idempotency import idempotent
+from .pagination import KeysetCursorPagination
 from .serializers import (
     MyTokenObtainPairSerializer,
     UserSerializer, UserRegistrationSerializer, AddressSerializer,
-    CategorySerializer, BrandSerializer, ProductSerializer,
+    CategorySerializer, BrandSerializer, ProductSerializer, ProductListSerializer,
     ReviewSerializer, WishlistSerializer,
-    CartSerializer, CartItemSerializer,
-    OrderSerializer, OrderItemSerializer # Added for Order
+    CartSerializer, CartItemSerializer, CartBatchSerializer,
+    OrderSerializer, OrderItemSerializer, OrderSummarySerializer, SellerOrderItemSerializer
 )
 
 class MyTokenObtainPairView(TokenObtainPairView):
@@ -32,6 +51,13 @@ class IsSellerOrReadOnly(permissions.BasePermission):
         # Write permissions are only allowed to the seller of the product.
         return obj.seller == request.user
 
+class IsSeller(permissions.BasePermission):
+    """
+    Only allow users with a seller account.
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.is_seller)
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
     Custom permission to only allow owners of an object to edit it.
@@ -89,15 +115,72 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsSellerOrReadOnly]
+    pagination_class = KeysetCursorPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
         # Allow sellers to see their unavailable products
         if self.request.user.is_authenticated and self.request.user.is_seller:
             if self.action in ['list', 'retrieve'] and self.request.query_params.get('seller_products') == 'true':
-                return Product.objects.filter(seller=self.request.user)
+                queryset = Product.objects.filter(seller=self.request.user)
+        search_query = self.request.query_params.get('search')
+        if search_query and self.action == 'list':
+            queryset = search_products(queryset, search_query)
+        if self.action in ['list', 'retrieve']:
+            queryset = self.optimize_queryset(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ProductListSerializer
+        return ProductSerializer
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(queryset, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        # A lookup that is not a product id is a 404, as get_object() would answer
+        try:
+            queryset = self.get_queryset().filter(pk=self.kwargs['pk'])
+        except (TypeError, ValueError, DjangoValidationError):
+            raise Http404
+        return self.conditional_response(queryset, super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, queryset, render, request, *args, **kwargs):
+        # Validators come from one aggregate query, a match skips serialization entirely
+        last_modified, count = collection_fingerprint(queryset)
+        etag = make_etag(
+            self.action, last_modified, count, request.get_full_path(),
+            get_navigation_version(), request.user.pk, wishlist_fingerprint(request),
+        )
+        # Last-Modified can't see per-user fields, only offer it to anonymous clients
+        if request.user.is_authenticated:
+            last_modified = None
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = render(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def optimize_queryset(self, queryset):
+        # Join/prefetch only what the requested fields will touch
+        fields = self.get_serializer_class().get_requested_fields(self.request)
+        related = [name for name in ('category', 'brand') if name in fields]
+        if related:
+            queryset = queryset.select_related(*related)
+        if 'reviews' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('reviews', queryset=Review.objects.select_related('user'))
+            )
+        if 'description' not in fields:
+            queryset = queryset.defer('description')
         return queryset
 
+    def get_pagination_ordering(self):
+        # ?sort= accepts the same options as the HTML catalog
+        params = self.request.query_params
+        return SORT_ORDERINGS[get_sort_key(params.get('sort'), params.get('search'))]
+
     def perform_create(self, serializer):
         if not self.request.user.is_seller:
             raise permissions.PermissionDenied("Only sellers can create products.")
@@ -106,7 +189,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def add_to_wishlist(self, request, pk=None):
         product = self.get_object()
-        wishlist_item, created = Wishlist.objects.get_or_create(user=request.user, product=product)
+        created = add_to_wishlist(request.user, product)
         if created:
             return Response({'status': 'product added to wishlist'}, status=status.HTTP_201_CREATED)
         return Response({'status': 'product already in wishlist'}, status=status.HTTP_200_OK)
@@ -141,7 +224,7 @@ class WishlistViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return Wishlist.objects.filter(user=self.request.user).select_related('product')
 
     def perform_create(self, serializer):
         product_id = self.request.data.get('product')
@@ -150,7 +233,12 @@ class WishlistViewSet(viewsets.ModelViewSet):
         product = generics.get_object_or_404(Product, pk=product_id)
         if Wishlist.objects.filter(user=self.request.user, product=product).exists():
             raise generics.ValidationError("Product already in wishlist.")
-        serializer.save(user=self.request.user, product=product)
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user, product=product)
+        except IntegrityError:
+            # Added concurrently, the unique constraint caught it
+            raise ValidationError("Product already in wishlist.")
 
 # --- Cart API Views ---
 
@@ -159,89 +247,100 @@ class CartViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['get', 'post', 'put', 'delete'] # Limit methods
 
+    # Product columns rendered by the compact product serializer of cart items
+    item_fields = [
+        'cart', 'quantity', 'product', 'product__name', 'product__slug', 'product__price',
+        'product__image', 'product__avg_rating', 'product__review_count',
+    ]
+
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        items = CartItem.objects.select_related('product').only(*self.item_fields).order_by('id')
+        return (
+            Cart.objects.filter(user=self.request.user)
+            .with_totals()
+            .prefetch_related(Prefetch('items', queryset=items))
+        )
 
     def get_object(self):
         # Ensure a cart exists for the user
         cart, created = Cart.objects.get_or_create(user=self.request.user)
         return cart
 
-    def list(self, request, *args, **kwargs):
-        cart = self.get_object()
+    def get_cart(self):
+        # Writes go through the cart service, the same one the HTML cart uses
+        return CartService.for_request(self.request)
+
+    def cart_response(self):
+        # Load with totals and items so the cart is rendered in a fixed number of queries
+        cart = self.get_queryset().first()
+        if cart is None:
+            self.get_object()
+            cart = self.get_queryset().get()
         serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def list(self, request, *args, **kwargs):
+        return self.cart_response()
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def add_item(self, request):
-        cart = self.get_object()
         product_id = request.data.get('product_id')
         quantity = request.data.get('quantity', 1)
 
         if not product_id:
             return Response({'product_id': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+        if not Product.objects.filter(id=product_id).exists():
             return Response({'product_id': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-        if not created:
-            cart_item.quantity += int(quantity)
-        else:
-            cart_item.quantity = int(quantity)
-        cart_item.save()
-
-        serializer = CartSerializer(cart)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        self.get_cart().add(int(product_id), int(quantity))
+        return self.cart_response()
 
     @action(detail=False, methods=['put'])
+    @idempotent
     def update_item(self, request):
-        cart = self.get_object()
         product_id = request.data.get('product_id')
         quantity = request.data.get('quantity')
 
         if not product_id or quantity is None:
             return Response({'detail': 'product_id and quantity are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            cart_item = CartItem.objects.get(cart=cart, product__id=product_id)
-        except CartItem.DoesNotExist:
+        if not self.get_cart().set(int(product_id), int(quantity)):
             return Response({'detail': 'Item not found in cart.'}, status=status.HTTP_404_NOT_FOUND)
 
-        if int(quantity) <= 0:
-            cart_item.delete()
-        else:
-            cart_item.quantity = int(quantity)
-            cart_item.save()
-
-        serializer = CartSerializer(cart)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.cart_response()
 
     @action(detail=False, methods=['delete'])
+    @idempotent
     def remove_item(self, request):
-        cart = self.get_object()
         product_id = request.data.get('product_id')
 
         if not product_id:
             return Response({'product_id': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            cart_item = CartItem.objects.get(cart=cart, product__id=product_id)
-            cart_item.delete()
-        except CartItem.DoesNotExist:
+        if not self.get_cart().remove(int(product_id)):
             return Response({'detail': 'Item not found in cart.'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = CartSerializer(cart)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.cart_response()
+
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def batch(self, request):
+        """
+        Apply several add/set/remove operations in one transaction, e.g.
+        ``{"operations": [{"op": "add", "product_id": 1, "quantity": 2}, {"op": "remove", "product_id": 3}]}``.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.get_cart().apply(serializer.validated_data['operations'])
+        return self.cart_response()
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def clear_cart(self, request):
-        cart = self.get_object()
-        cart.items.all().delete()
-        serializer = CartSerializer(cart)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        self.get_cart().clear()
+        return self.cart_response()
 
 # --- Order API Views ---
 
@@ -251,32 +350,95 @@ class OrderViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post'] # Only allow listing and creating orders
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        queryset = Order.objects.filter(user=self.request.user)
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id')),
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderSummarySerializer
+        return OrderSerializer
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        ticket = request.headers.get('X-Checkout-Ticket')
+        try:
+            with checkout_slot(int(ticket) if ticket and ticket.isdigit() else None):
+                return super().create(request, *args, **kwargs)
+        except InsufficientStock as e:
+            # Nothing was written, tell the client which items to fix
+            return Response({'detail': 'Not enough stock.', 'shortages': e.shortages}, status=status.HTTP_409_CONFLICT)
+        except CheckoutBusy as busy:
+            # Retry after Retry-After seconds, sending the ticket back in X-Checkout-Ticket
+            response = Response({
+                'detail': 'Checkout is busy, please retry.',
+                'ticket': busy.ticket,
+                'position': busy.position,
+                'status_url': self.reverse_action(self.checkout_status.url_name),
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = busy.retry_after
+            if busy.ticket is not None:
+                response['X-Checkout-Ticket'] = busy.ticket
+            return response
+
+    @action(detail=False, methods=['get'], url_path='checkout-status')
+    def checkout_status(self, request):
+        """
+        Place of an X-Checkout-Ticket in the checkout queue, 0 when it may retry.
+        """
+        ticket = request.query_params.get('ticket') or request.headers.get('X-Checkout-Ticket')
+        if not ticket or not ticket.isdigit():
+            raise ValidationError({'ticket': 'A checkout ticket is required.'})
+        position = admission.status(int(ticket))
+        return Response({
+            'ticket': int(ticket),
+            'position': position,
+            'ready': position == 0,
+            'retry_after': admission.retry_after(position),
+        })
 
     def perform_create(self, serializer):
         user = self.request.user
-        cart = generics.get_object_or_404(Cart, user=user)
-        cart_items = cart.items.all()
-
-        if not cart_items:
-            raise generics.ValidationError("Your cart is empty.")
+        data = serializer.validated_data
 
         # Get address from validated data
-        address = serializer.validated_data.get('address')
-        if not address:
-            raise generics.ValidationError({"address_id": "Address is required to create an order."})
-
-        # Create the order
-        order = serializer.save(user=user, total_price=cart.total_price, paid=False)
-
-        # Move cart items to order items
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                price=cart_item.product.price,
-                quantity=cart_item.quantity
+        address = data.pop('address', None)
+        if not address or address.user_id != user.pk:
+            raise ValidationError({"address_id": "Address is required to create an order."})
+
+        try:
+            serializer.instance = create_order(
+                user,
+                CartService.for_request(self.request),
+                address=' '.join(filter(None, [address.address_line_1, address.address_line_2])),
+                paid=False,
+                **data,
+            )
+        except EmptyCartError:
+            raise ValidationError("Your cart is empty.")
+        return serializer.instance
+
+
+class SellerOrderItemViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Items sold by the current seller, newest first. Served from the
+    (seller, created) index with keyset pagination.
+    """
+    serializer_class = SellerOrderItemSerializer
+    permission_classes = [IsSeller]
+    pagination_class = KeysetCursorPagination
+
+    def get_queryset(self):
+        return (
+            OrderItem.objects.filter(seller=self.request.user).select_related('order')
+            .only(
+                'order__order_number', 'order__paid', 'created',
+                'product_id', 'product_name', 'product_slug', 'price', 'quantity',
             )
-        cart.items.all().delete() # Clear the cart
+        )
 
-        return order
+    def get_pagination_ordering(self):
+        return ('-created', '-id')
@@ -1,75 +1,189 @@
-from decimal import Decimal
+import secrets
+
 from django.conf import settings
 from shop.models import Product
+from .storage import get_anonymous_storage, get_user_storage
 
 
 class Cart:
+    """
+    The cart of the current visitor, whatever it is stored in.
+
+    Signed-in users use the user storage (the database), anonymous visitors the
+    anonymous storage under a random token kept in the session. The session is
+    only written when that token is created.
+    """
+
     def __init__(self, request):
         """
         Initialize the cart.
         """
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # save an empty cart in the session
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self.user = request.user
+        if self.user.is_authenticated:
+            self.storage = get_user_storage()
+            self.key = self.user.pk
+            if settings.CART_SESSION_ID in self.session:
+                # Left over from before the login
+                merge_session_cart(request, self.user)
+        else:
+            self.storage = get_anonymous_storage()
+            self.key = self._session_token()
+        self._reset()
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        Return the cart of this request, built once and shared by the views,
+        context processors and templates that ask for it.
+        """
+        # DRF wraps the HttpRequest, keep the cart on the underlying one
+        http_request = getattr(request, '_request', request)
+        cart = getattr(http_request, '_cart', None)
+        if cart is None or cart.user != request.user:
+            cart = http_request._cart = cls(request)
+        return cart
+
+    def _session_token(self):
+        token = self.session.get(settings.CART_SESSION_ID)
+        if isinstance(token, dict):
+            # Cart stored in the session itself before the storages existed
+            lines = {int(product_id): line['quantity'] for product_id, line in token.items()}
+            token = self._new_session_token() if lines else None
+            if token:
+                self.storage.add_many(token, lines)
+            else:
+                self.session.pop(settings.CART_SESSION_ID, None)
+        return token
+
+    def _new_session_token(self):
+        token = secrets.token_urlsafe(16)
+        self.session[settings.CART_SESSION_ID] = token
+        return token
+
+    def _write_key(self):
+        if self.key is None:
+            self.key = self._new_session_token()
+        return self.key
 
     def add(self, product, quantity=1, override_quantity=False):
         """
         Add a product to the cart or update its quantity.
         """
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {'quantity': 0,
-                                     'price': str(product.price)}
-        if override_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
-        self.save()
+        product_id = getattr(product, 'pk', product)
+        key = self._write_key()
+        if not override_quantity:
+            self.storage.add(key, product_id, quantity)
+        elif not self.storage.set(key, product_id, quantity) and quantity > 0:
+            self.storage.add(key, product_id, quantity)
+        self._reset()
 
-    def save(self):
-        # mark the session as "modified" to make sure it gets saved
-        self.session.modified = True
+    def set(self, product, quantity):
+        """
+        Change the quantity of a product already in the cart, 0 removes it.
+        Returns whether the product was in the cart.
+        """
+        if self.key is None:
+            return False
+        found = self.storage.set(self.key, getattr(product, 'pk', product), quantity)
+        self._reset()
+        return found
 
     def remove(self, product):
         """
-        Remove a product from the cart.
+        Remove a product from the cart. Returns whether it was in the cart.
+        """
+        if self.key is None:
+            return False
+        found = self.storage.remove(self.key, getattr(product, 'pk', product))
+        self._reset()
+        return found
+
+    def apply(self, operations):
+        """
+        Apply a list of add/set/remove operations, see BaseCartStorage.apply().
+        """
+        self.storage.apply(self._write_key(), operations)
+        self._reset()
+
+    def _reset(self):
+        # Derived data, rebuilt lazily after every change
+        self._lines = None
+        self._items = None
+
+    def get_lines(self):
+        """
+        ``{product_id: quantity}``, read from the storage once.
+        """
+        if self._lines is None:
+            self._lines = self.storage.get_lines(self.key) if self.key is not None else {}
+        return self._lines
+
+    def _get_items(self):
+        """
+        Cart lines with their products, fetched with a single query on first use.
         """
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+        if self._items is None:
+            lines = self.get_lines()
+            products = Product.objects.in_bulk(list(lines))
+            items = []
+            for product_id, quantity in lines.items():
+                product = products.get(product_id)
+                if product is None:
+                    continue
+                items.append({
+                    'product': product,
+                    'quantity': quantity,
+                    'price': product.price,
+                    'total_price': product.price * quantity,
+                })
+            self._items = items
+        return self._items
 
     def __iter__(self):
         """
         Iterate over the items in the cart and get the products
         from the database.
         """
-        product_ids = self.cart.keys()
-        # get the product objects and add them to the cart
-        products = Product.objects.filter(id__in=product_ids)
-
-        cart = self.cart.copy()
-        for product in products:
-            cart[str(product.id)]['product'] = product
-
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+        return iter(self._get_items())
 
     def __len__(self):
         """
         Count all items in the cart.
         """
-        return sum(item['quantity'] for item in self.cart.values())
+        return sum(self.get_lines().values())
 
     def get_total_price(self):
-        return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
+        return sum((item['total_price'] for item in self._get_items()), 0)
+
+    def fingerprint(self):
+        """
+        Changes whenever the content of the cart does.
+        """
+        return tuple(sorted(self.get_lines().items()))
 
     def clear(self):
-        # remove cart from session
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+        if self.key is not None:
+            self.storage.clear(self.key)
+        self._reset()
+
+
+def merge_session_cart(request, user):
+    """
+    Move the anonymous cart of this session into the user's cart, adding up
+    quantities, with a single bulk write.
+    """
+    token = request.session.get(settings.CART_SESSION_ID)
+    if token is None:
+        return
+    storage = get_anonymous_storage()
+    if isinstance(token, dict):
+        lines = {int(product_id): line['quantity'] for product_id, line in token.items()}
+    else:
+        lines = storage.get_lines(token)
+        storage.clear(token)
+    request.session.pop(settings.CART_SESSION_ID, None)
+    if lines:
+        get_user_storage().add_many(user.pk, lines)
+    # Drop a cart memoized before the login
+    getattr(request, '_request', request).__dict__.pop('_cart', None)
@@ -1,4 +1,4 @@
 from .cart import Cart
 
 def cart(request):
-    return {'cart': Cart(request)}
\ No newline at end of file
+    return {'cart': Cart.for_request(request)}
\ No newline at end of file
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.models import CartLine
+
+
+class Command(BaseCommand):
+    help = 'Delete anonymous cart lines older than CART_ANONYMOUS_TTL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.CART_ANONYMOUS_TTL)
+        deleted = 0
+        while True:
+            ids = list(CartLine.objects.filter(created__lt=cutoff).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += CartLine.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(f'Deleted {deleted} anonymous cart lines.')
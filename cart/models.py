@@ -1,3 +1,22 @@
 from django.db import models
+from django.utils import timezone
+from shop.models import Product
 
-# Create your models here.
+
+class CartLine(models.Model):
+    """
+    Line of an anonymous cart, see cart.storage.AnonymousDatabaseCartStorage.
+    ``token`` is the random cart token kept in the visitor's session.
+    """
+    token = models.CharField(max_length=32)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'product'], name='unique_cart_line'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product_id} in {self.token}'
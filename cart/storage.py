@@ -0,0 +1,345 @@
+import time
+import uuid
+from functools import lru_cache
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from api_v1.models import Cart, CartItem
+from ecommerce.db import upsert_increment
+from .models import CartLine
+
+DEFAULT_ANONYMOUS_STORAGE = 'cart.storage.AnonymousDatabaseCartStorage'
+
+
+class BaseCartStorage:
+    """
+    Stores cart lines, ``{product_id: quantity}``, under a cart key: the user's
+    pk for signed-in users, a random token kept in the session otherwise.
+
+    Every operation costs a constant number of round-trips whatever the size of
+    the cart.
+    """
+
+    def get_lines(self, key):
+        raise NotImplementedError
+
+    def add(self, key, product_id, quantity):
+        """
+        Increase the quantity of a line, creating it if needed.
+        """
+        self.add_many(key, {product_id: quantity})
+
+    def add_many(self, key, lines):
+        raise NotImplementedError
+
+    def set(self, key, product_id, quantity):
+        """
+        Replace the quantity of an existing line, 0 removes it. Returns whether
+        the line existed.
+        """
+        raise NotImplementedError
+
+    def remove(self, key, product_id):
+        """
+        Remove a line. Returns whether it existed.
+        """
+        raise NotImplementedError
+
+    def clear(self, key):
+        raise NotImplementedError
+
+    def apply(self, key, operations):
+        """
+        Apply ``[{'op': 'add'|'set'|'remove', 'product_id': ..., 'quantity': ...}]``
+        in order.
+        """
+        self.replace(key, collapse_operations(self.get_lines(key), operations))
+
+    def replace(self, key, changes):
+        """
+        Write final quantities, ``{product_id: quantity}``, 0 removes the line.
+        """
+        raise NotImplementedError
+
+
+def collapse_operations(current, operations):
+    """
+    Final quantity of every product touched by ``operations``, starting from the
+    ``current`` lines.
+    """
+    final = {}
+    for operation in operations:
+        product_id = operation['product_id']
+        quantity = final.get(product_id, current.get(product_id, 0))
+        if operation['op'] == 'add':
+            quantity += operation['quantity']
+        elif operation['op'] == 'set':
+            quantity = operation['quantity']
+        else:
+            quantity = 0
+        final[product_id] = quantity
+    return final
+
+
+class DictCartStorage(BaseCartStorage):
+    """
+    Keeps a whole cart as one dict: every operation is a single load and store.
+    """
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def store(self, key, lines):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_lines(self, key):
+        return dict(self.load(key) or {})
+
+    def add_many(self, key, lines):
+        stored = self.get_lines(key)
+        for product_id, quantity in lines.items():
+            stored[product_id] = stored.get(product_id, 0) + quantity
+        self.store(key, stored)
+
+    def set(self, key, product_id, quantity):
+        stored = self.get_lines(key)
+        if product_id not in stored:
+            return False
+        self.replace(key, {product_id: quantity}, stored)
+        return True
+
+    def remove(self, key, product_id):
+        return self.set(key, product_id, 0)
+
+    def clear(self, key):
+        self.delete(key)
+
+    def replace(self, key, changes, stored=None):
+        stored = self.get_lines(key) if stored is None else stored
+        for product_id, quantity in changes.items():
+            if quantity > 0:
+                stored[product_id] = quantity
+            else:
+                stored.pop(product_id, None)
+        if stored:
+            self.store(key, stored)
+        else:
+            self.delete(key)
+
+
+class CacheCartStorage(DictCartStorage):
+    """
+    Anonymous carts in the Django cache, expiring ``CART_CACHE_TIMEOUT`` seconds
+    after their last change. Needs a shared, persistent cache (Redis, Memcached):
+    refused with the local-memory cache, which loses carts on restart and is
+    not shared between processes.
+
+    Writes of a cart are serialized with a short lock taken by ``cache.add``, so
+    concurrent changes are not lost.
+    """
+    prefix = 'cart:'
+    lock_timeout = 5
+    lock_wait = 2
+
+    def __init__(self):
+        backend = caches['default']
+        if isinstance(backend, (LocMemCache, DummyCache)):
+            raise ImproperlyConfigured(f'CacheCartStorage needs a shared cache backend, not {type(backend).__name__}.')
+        self.timeout = getattr(settings, 'CART_CACHE_TIMEOUT', 60 * 60 * 24 * 30)
+
+    def load(self, key):
+        return cache.get(f'{self.prefix}{key}')
+
+    def store(self, key, lines):
+        cache.set(f'{self.prefix}{key}', lines, self.timeout)
+
+    def delete(self, key):
+        cache.delete(f'{self.prefix}{key}')
+
+    def add_many(self, key, lines):
+        with self.lock(key):
+            super().add_many(key, lines)
+
+    def set(self, key, product_id, quantity):
+        with self.lock(key):
+            return super().set(key, product_id, quantity)
+
+    def apply(self, key, operations):
+        with self.lock(key):
+            super().apply(key, operations)
+
+    def lock(self, key):
+        return _CacheLock(f'{self.prefix}{key}:lock', self.lock_timeout, self.lock_wait)
+
+
+class _CacheLock:
+
+    def __init__(self, key, timeout, wait):
+        self.key = key
+        self.timeout = timeout
+        self.wait = wait
+        self.token = uuid.uuid4().hex
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.wait
+        while not cache.add(self.key, self.token, self.timeout):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Could not lock {self.key}.')
+            time.sleep(0.01)
+
+    def __exit__(self, *exc_info):
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+class MemoryCartStorage(DictCartStorage):
+    """
+    Process-local carts, for tests and local development.
+    """
+
+    def __init__(self):
+        self.carts = {}
+        self.lock = Lock()
+
+    def load(self, key):
+        with self.lock:
+            return self.carts.get(key)
+
+    def store(self, key, lines):
+        with self.lock:
+            self.carts[key] = dict(lines)
+
+    def delete(self, key):
+        with self.lock:
+            self.carts.pop(key, None)
+
+
+class RowCartStorage(BaseCartStorage):
+    """
+    One database row per cart line, with a unique constraint on (cart, product).
+    Adds are a single INSERT ... ON CONFLICT, batches run under row locks.
+    """
+    model = None
+    unique_fields = None
+
+    def _items(self, key):
+        raise NotImplementedError
+
+    def _cart_fields(self, key):
+        """
+        Fields identifying the cart on new rows.
+        """
+        raise NotImplementedError
+
+    def get_lines(self, key):
+        return dict(self._items(key).order_by('id').values_list('product_id', 'quantity'))
+
+    def add_many(self, key, lines):
+        if not lines:
+            return
+        cart_fields = self._cart_fields(key)
+        # Single INSERT ... ON CONFLICT statement, concurrent adds are summed
+        upsert_increment(
+            self.model,
+            [{**cart_fields, 'product_id': product_id, 'quantity': quantity}
+             for product_id, quantity in lines.items()],
+            unique_fields=self.unique_fields, increment_fields=['quantity'],
+        )
+
+    def set(self, key, product_id, quantity):
+        items = self._items(key).filter(product_id=product_id)
+        if quantity <= 0:
+            found, _ = items.delete()
+        else:
+            found = items.update(quantity=quantity)
+        return bool(found)
+
+    def remove(self, key, product_id):
+        deleted, _ = self._items(key).filter(product_id=product_id).delete()
+        return bool(deleted)
+
+    def clear(self, key):
+        self._items(key).delete()
+
+    def apply(self, key, operations):
+        with transaction.atomic():
+            rows = list(self._items(key).select_for_update().values_list('product_id', 'id', 'quantity'))
+            item_ids = {product_id: item_id for product_id, item_id, quantity in rows}
+            current = {product_id: quantity for product_id, item_id, quantity in rows}
+            final = collapse_operations(current, operations)
+
+            removed = [product_id for product_id, quantity in final.items() if quantity <= 0 and product_id in current]
+            created = {product_id: quantity for product_id, quantity in final.items()
+                       if quantity > 0 and product_id not in current}
+            changed = [
+                self.model(id=item_ids[product_id], quantity=quantity)
+                for product_id, quantity in final.items()
+                if quantity > 0 and product_id in current and quantity != current[product_id]
+            ]
+            if removed:
+                self._items(key).filter(product_id__in=removed).delete()
+            if created:
+                cart_fields = self._cart_fields(key)
+                self.model.objects.bulk_create([
+                    self.model(**cart_fields, product_id=product_id, quantity=quantity)
+                    for product_id, quantity in created.items()
+                ])
+            if changed:
+                self.model.objects.bulk_update(changed, ['quantity'])
+
+    def replace(self, key, changes):
+        self.apply(key, [{'op': 'set', 'product_id': product_id, 'quantity': quantity}
+                         for product_id, quantity in changes.items()])
+
+
+class DatabaseCartStorage(RowCartStorage):
+    """
+    Carts of signed-in users, in the ``api_v1`` Cart/CartItem tables that the
+    REST API and checkout read. Keys are user pks.
+    """
+    model = CartItem
+    unique_fields = ['cart_id', 'product_id']
+
+    def _items(self, key):
+        return CartItem.objects.filter(cart__user_id=key)
+
+    def _cart_fields(self, key):
+        cart, _ = Cart.objects.get_or_create(user_id=key)
+        return {'cart_id': cart.pk}
+
+
+class AnonymousDatabaseCartStorage(RowCartStorage):
+    """
+    Anonymous carts in the CartLine table, keyed by the session's cart token.
+    Lines older than CART_ANONYMOUS_TTL are deleted by
+    `manage.py purge_anonymous_carts`.
+    """
+    model = CartLine
+    unique_fields = ['token', 'product_id']
+
+    def _items(self, key):
+        return CartLine.objects.filter(token=key)
+
+    def _cart_fields(self, key):
+        return {'token': key, 'created': timezone.now()}
+
+
+@lru_cache(maxsize=None)
+def get_anonymous_storage():
+    return import_string(getattr(settings, 'CART_ANONYMOUS_STORAGE', DEFAULT_ANONYMOUS_STORAGE))()
+
+
+@lru_cache(maxsize=None)
+def get_user_storage():
+    return DatabaseCartStorage()
@@ -5,12 +5,12 @@ from .cart import Cart
 from django.contrib import messages
 
 def cart_detail(request):
-    cart = Cart(request)
+    cart = Cart.for_request(request)
     return render(request, 'cart/detail.html', {'cart': cart})
 
 @require_POST
 def cart_add(request, product_id):
-    cart = Cart(request)
+    cart = Cart.for_request(request)
     product = get_object_or_404(Product, id=product_id)
     quantity = int(request.POST.get('quantity', 1))
     cart.add(product=product, quantity=quantity)
@@ -19,7 +19,7 @@ def cart_add(request, product_id):
 
 @require_POST
 def cart_remove(request, product_id):
-    cart = Cart(request)
+    cart = Cart.for_request(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
     messages.success(request, 'Товар удален из корзины')
@@ -27,7 +27,7 @@ def cart_remove(request, product_id):
 
 @require_POST
 def cart_update(request, product_id):
-    cart = Cart(request)
+    cart = Cart.for_request(request)
     product = get_object_or_404(Product, id=product_id)
     quantity = int(request.POST.get('quantity', 1))
     cart.add(product=product, quantity=quantity, override_quantity=True)
@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import ProductDailySales, SellerDailySales
 
-# Register your models here.
+@admin.register(SellerDailySales)
+class SellerDailySalesAdmin(admin.ModelAdmin):
+    list_display = ['seller', 'day', 'orders', 'units', 'revenue']
+    list_select_related = ['seller']
+    list_filter = ['day']
+    raw_id_fields = ['seller']
+
+@admin.register(ProductDailySales)
+class ProductDailySalesAdmin(admin.ModelAdmin):
+    list_display = ['product', 'product_name', 'seller', 'day', 'units', 'revenue']
+    list_select_related = ['product', 'seller']
+    list_filter = ['day']
+    raw_id_fields = ['product', 'seller']
@@ -0,0 +1,70 @@
+"""
+Bulk edits of a seller's products. Each action is one UPDATE filtered on the
+seller, so only their own products can be touched whatever ids are posted.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Greatest, Least, Now, Round
+
+from shop.models import Product
+
+MIN_PRICE = Decimal('0.01')
+# Largest price the column holds, 99999999.99 for max_digits=10
+_price_field = Product._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (_price_field.max_digits - _price_field.decimal_places) - MIN_PRICE
+
+
+def _products(seller, product_ids):
+    return Product.objects.filter(seller=seller, id__in=product_ids)
+
+
+def set_available(seller, product_ids, available):
+    return _products(seller, product_ids).update(available=available, updated=Now())
+
+
+def toggle_available(seller, product_ids):
+    return _products(seller, product_ids).update(
+        available=Case(When(available=True, then=Value(False)), default=Value(True)),
+        updated=Now(),
+    )
+
+
+def set_stock(seller, product_ids, stock):
+    # Sharded stock lives in inventory.StockShard, the rebalancer would overwrite it
+    return _products(seller, product_ids).filter(stock_sharded=False).update(stock=stock, updated=Now())
+
+
+def adjust_price(seller, product_ids, percent):
+    """
+    Change prices by ``percent`` (-10 for 10% off), rounded to the cent and
+    kept between MIN_PRICE and MAX_PRICE, so a raise cannot overflow the column.
+    """
+    factor = Value((Decimal(100) + percent) / 100, output_field=DecimalField(max_digits=12, decimal_places=6))
+    return _products(seller, product_ids).update(
+        price=Least(
+            Greatest(
+                Round(F('price') * factor, 2, output_field=DecimalField(max_digits=14, decimal_places=2)),
+                Value(MIN_PRICE),
+            ),
+            Value(MAX_PRICE),
+        ),
+        updated=Now(),
+    )
+
+
+def apply(seller, product_ids, action, stock=None, percent=None):
+    """
+    Run a bulk action of ProductBulkForm. Returns the number of products changed.
+    """
+    if action == 'enable':
+        return set_available(seller, product_ids, True)
+    if action == 'disable':
+        return set_available(seller, product_ids, False)
+    if action == 'toggle':
+        return toggle_available(seller, product_ids)
+    if action == 'set_stock':
+        return set_stock(seller, product_ids, stock)
+    if action == 'adjust_price':
+        return adjust_price(seller, product_ids, percent)
+    raise ValueError(action)
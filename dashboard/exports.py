@@ -0,0 +1,86 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from orders.models import OrderItem
+from shop.models import Product
+
+FORMATS = ('csv', 'jsonl')
+
+# (column label, queryset lookup)
+PRODUCT_COLUMNS = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('slug', 'slug'),
+    ('category', 'category__slug'),
+    ('brand', 'brand__slug'),
+    ('description', 'description'),
+    ('price', 'price'),
+    ('stock', 'stock'),
+    ('available', 'available'),
+    ('created', 'created'),
+    ('updated', 'updated'),
+]
+ORDER_ITEM_COLUMNS = [
+    ('id', 'id'),
+    ('order_id', 'order_id'),
+    ('order_number', 'order__order_number'),
+    ('ordered', 'created'),
+    ('paid', 'order__paid'),
+    ('product_id', 'product_id'),
+    ('product', 'product_name'),
+    ('price', 'price'),
+    ('quantity', 'quantity'),
+]
+
+
+class Echo:
+    """
+    File-like object whose write() hands the line back, lets csv.writer feed a generator.
+    """
+    def write(self, value):
+        return value
+
+
+def seller_products(seller, since=None, until=None):
+    products = Product.objects.filter(seller=seller)
+    return _date_range(products, 'created', since, until), PRODUCT_COLUMNS
+
+
+def seller_order_items(seller, since=None, until=None):
+    items = OrderItem.objects.filter(seller=seller)
+    return _date_range(items, 'created', since, until), ORDER_ITEM_COLUMNS
+
+
+def _date_range(queryset, field, since, until):
+    if since:
+        queryset = queryset.filter(**{f'{field}__date__gte': since})
+    if until:
+        queryset = queryset.filter(**{f'{field}__date__lte': until})
+    return queryset
+
+
+def iter_rows(queryset, columns, after=None, chunk_size=2000):
+    """
+    Rows as tuples in id order, fetched ``chunk_size`` at a time.
+
+    ``after`` is the last id a previous, interrupted export delivered.
+    """
+    if after:
+        queryset = queryset.filter(id__gt=after)
+    lookups = [lookup for _, lookup in columns]
+    return queryset.order_by('id').values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([label for label, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(columns, rows):
+    labels = [label for label, _ in columns]
+    for row in rows:
+        yield json.dumps(dict(zip(labels, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
@@ -1,7 +1,75 @@
 from django import forms
+from inventory.shards import reset_stock
 from shop.models import Product
+from .importers import FORMATS
 
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
         fields = ['category', 'brand', 'name', 'slug', 'image', 'description', 'price', 'stock', 'available']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.stock_sharded:
+            # The stock column is only a snapshot while the stock is sharded
+            self.initial['stock'] = self.instance.available_stock
+
+    def save(self, commit=True):
+        product = super().save(commit=commit)
+        if commit and product.stock_sharded and 'stock' in self.changed_data:
+            reset_stock(product.pk, product.stock)
+        return product
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header row, or JSON Lines. Columns: name, slug, category, brand, description, price, stock, available.')
+    format = forms.ChoiceField(choices=[('', 'Detect from file name')] + [(f, f.upper()) for f in FORMATS], required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload and not cleaned_data.get('format'):
+            extension = upload.name.rsplit('.', 1)[-1].lower()
+            if extension not in FORMATS:
+                raise forms.ValidationError('Choose a format, the file name does not end in .csv or .jsonl.')
+            cleaned_data['format'] = extension
+        return cleaned_data
+
+
+class ProductIdsField(forms.Field):
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(product_id) for product_id in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Invalid product selection.')
+
+
+class ProductBulkForm(forms.Form):
+    MAX_PRODUCTS = 1000
+
+    action = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-select'}), choices=[
+        ('enable', 'Make available'),
+        ('disable', 'Make unavailable'),
+        ('toggle', 'Toggle availability'),
+        ('set_stock', 'Set stock'),
+        ('adjust_price', 'Adjust price by %'),
+    ])
+    products = ProductIdsField()
+    stock = forms.IntegerField(min_value=0, required=False)
+    percent = forms.DecimalField(min_value=-99, max_value=1000, decimal_places=2, required=False)
+
+    def clean_products(self):
+        products = self.cleaned_data['products']
+        if len(products) > self.MAX_PRODUCTS:
+            raise forms.ValidationError(f'Select at most {self.MAX_PRODUCTS} products.')
+        return products
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        if action == 'set_stock' and cleaned_data.get('stock') is None:
+            self.add_error('stock', 'Enter the new stock.')
+        if action == 'adjust_price' and cleaned_data.get('percent') is None:
+            self.add_error('percent', 'Enter a percentage.')
+        return cleaned_data
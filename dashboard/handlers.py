@@ -0,0 +1,7 @@
+from outbox.events import handler
+from .rollups import add_order
+
+
+@handler('order.placed')
+def record_sales(payload):
+    add_order(payload['order_id'])
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import time
+
+from django import forms
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from inventory.shards import reset_stock
+from shop.models import Brand, Category, Product
+from shop.navigation import invalidate_navigation
+from shop.search import get_search_backend
+
+FORMATS = ('csv', 'jsonl')
+UPDATE_FIELDS = ['category', 'brand', 'name', 'description', 'price', 'stock', 'available', 'updated']
+
+
+class ProductRowForm(forms.Form):
+    name = forms.CharField(max_length=200)
+    slug = forms.SlugField(max_length=200, required=False)
+    category = forms.CharField()
+    brand = forms.CharField()
+    description = forms.CharField(required=False)
+    price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = forms.IntegerField(min_value=0)
+    available = forms.NullBooleanField(required=False)
+
+    def __init__(self, *args, categories, brands, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = categories
+        self.brands = brands
+
+    def clean_category(self):
+        return self._resolve(self.categories, self.cleaned_data['category'], 'category')
+
+    def clean_brand(self):
+        return self._resolve(self.brands, self.cleaned_data['brand'], 'brand')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('slug') and cleaned_data.get('name'):
+            cleaned_data['slug'] = slugify(cleaned_data['name'])[:200]
+            if not cleaned_data['slug']:
+                self.add_error('slug', 'A slug is required when it cannot be derived from the name.')
+        return cleaned_data
+
+    def _resolve(self, lookup, slug, label):
+        try:
+            return lookup[slug.strip()]
+        except KeyError:
+            raise forms.ValidationError(f'Unknown {label} "{slug}".')
+
+
+class ImportReport:
+    def __init__(self, max_errors=1000):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.started = time.monotonic()
+        self.finished = None
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        # Keep memory bounded on files that are wrong throughout
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, errors))
+
+    @property
+    def processed(self):
+        return self.created + self.updated + self.failed
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0
+
+
+def read_rows(stream, file_format):
+    """
+    Yield ``(line_number, row_dict_or_error)`` from a binary stream, one row at a time.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, f'Invalid JSON: {exc}'
+                continue
+            yield line_number, row if isinstance(row, dict) else 'Expected a JSON object.'
+
+
+class ProductImporter:
+    """
+    Create or update a seller's products from rows, matched on ``slug``.
+
+    Rows are validated one by one and written in chunks of ``batch_size`` with
+    one lookup query, one ``bulk_create`` and one ``bulk_update`` per chunk, each
+    chunk in its own transaction.
+    """
+
+    def __init__(self, seller, batch_size=500, max_errors=1000):
+        self.seller = seller
+        self.batch_size = batch_size
+        self.report = ImportReport(max_errors=max_errors)
+        self.navigation_changed = False
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.brands = dict(Brand.objects.values_list('slug', 'id'))
+
+    def run(self, rows):
+        batch = {}
+        for line_number, row in rows:
+            product = self.build(line_number, row)
+            if product is None:
+                continue
+            # A slug repeated inside a chunk: the last row wins
+            batch[product.slug] = product
+            if len(batch) >= self.batch_size:
+                self.write(list(batch.values()))
+                batch = {}
+        if batch:
+            self.write(list(batch.values()))
+        # New products or moved ones can change the category/brand menus
+        if self.report.created or self.navigation_changed:
+            invalidate_navigation()
+        self.report.finished = time.monotonic()
+        return self.report
+
+    def build(self, line_number, row):
+        if isinstance(row, str):
+            self.report.add_error(line_number, {'__all__': [row]})
+            return None
+        form = ProductRowForm(row, categories=self.categories, brands=self.brands)
+        if not form.is_valid():
+            self.report.add_error(line_number, {field: list(errors) for field, errors in form.errors.items()})
+            return None
+        data = form.cleaned_data
+        return Product(
+            seller=self.seller,
+            category_id=data['category'],
+            brand_id=data['brand'],
+            name=data['name'],
+            slug=data['slug'],
+            description=data['description'],
+            price=data['price'],
+            stock=data['stock'],
+            available=True if data['available'] is None else data['available'],
+        )
+
+    def write(self, products):
+        existing = {
+            slug: rest for slug, *rest in
+            Product.objects.filter(seller=self.seller, slug__in=[p.slug for p in products])
+            .values_list('slug', 'id', 'stock_sharded', 'category_id', 'brand_id')
+        }
+        now = timezone.now()
+        to_create, to_update, sharded = [], [], []
+        for product in products:
+            if product.slug in existing:
+                product.pk, product.stock_sharded, category_id, brand_id = existing[product.slug]
+                if (category_id, brand_id) != (product.category_id, product.brand_id):
+                    self.navigation_changed = True
+                product.updated = now
+                to_update.append(product)
+                if product.stock_sharded:
+                    sharded.append(product)
+            else:
+                to_create.append(product)
+        with transaction.atomic():
+            Product.objects.bulk_create(to_create)
+            Product.objects.bulk_update(to_update, UPDATE_FIELDS)
+            # The stock of sharded products is kept in their shards
+            for product in sharded:
+                reset_stock(product.pk, product.stock)
+            # Bulk writes skip the post_save signals, index the chunk ourselves
+            get_search_backend().index_many(to_create + to_update)
+        self.report.created += len(to_create)
+        self.report.updated += len(to_update)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.importers import FORMATS, ProductImporter, read_rows
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSON Lines file of products into a seller\'s catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('seller', help='Email of the seller who owns the products.')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            seller = User.objects.get(email=options['seller'], is_seller=True)
+        except User.DoesNotExist:
+            raise CommandError(f'No seller with email {options["seller"]}.')
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in FORMATS:
+            raise CommandError('Pass --format, the file name does not end in .csv or .jsonl.')
+
+        importer = ProductImporter(seller, batch_size=options['batch_size'])
+        with open(options['path'], 'rb') as stream:
+            report = importer.run(read_rows(stream, file_format))
+
+        for line, errors in report.errors:
+            messages = '; '.join(f'{field}: {" ".join(field_errors)}' for field, field_errors in errors.items())
+            self.stderr.write(f'line {line}: {messages}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {report.created}, updated {report.updated}, failed {report.failed} '
+            f'in {report.elapsed:.2f}s ({report.rows_per_second:.0f} rows/s).'
+        ))
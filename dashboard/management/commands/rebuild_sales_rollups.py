@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from dashboard.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from the order items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild, YYYY-MM-DD. Default: the first order.')
+        parser.add_argument('--until', help='Last day to rebuild, YYYY-MM-DD. Default: today.')
+
+    def handle(self, *args, **options):
+        since, until = (self.parse(options[name]) for name in ('since', 'until'))
+        orders = rebuild(since, until)
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {orders} orders.'))
+
+    def parse(self, value):
+        if value is None:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f'Invalid date: {value}')
+        return date
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_product_name(apps, schema_editor):
+    ProductDailySales = apps.get_model('dashboard', 'ProductDailySales')
+    Product = apps.get_model('shop', 'Product')
+    ProductDailySales.objects.update(
+        product_name=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('name')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_sales_rollups'),
+        ('shop', '0009_product_seller_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productdailysales',
+            name='product_name',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='productdailysales',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales', to='shop.product'),
+        ),
+        migrations.RunPython(fill_product_name, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,59 @@
+from django.conf import settings
 from django.db import models
+from orders.models import Order
+from shop.models import Product
 
-# Create your models here.
+
+class SellerDailySales(models.Model):
+    """
+    Sales of a seller on one day, kept up to date by dashboard.handlers as
+    orders are placed. ``orders`` counts each order once per seller.
+    """
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ('seller', 'day')
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='unique_seller_daily_sales'),
+        ]
+
+    def __str__(self):
+        return f'{self.seller_id} {self.day}: {self.revenue}'
+
+
+class ProductDailySales(models.Model):
+    """
+    Sales of a product on one day. Kept when the product is deleted, so the
+    top products still add up to the seller's revenue; ``product_name`` then
+    names it.
+    """
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='product_daily_sales')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_sales')
+    product_name = models.CharField(max_length=200, default='')
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ('product', 'day')
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id or self.product_name} {self.day}: {self.revenue}'
+
+
+class RolledUpOrder(models.Model):
+    """
+    Marks an order as counted in the rollups, so a retried event does not
+    count it twice.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='+')
@@ -0,0 +1,140 @@
+"""
+Daily sales rollups per seller and per product.
+
+Each placed order is added to the rollups once, by the ``order.placed`` outbox
+handler: one upsert per table, whatever the number of items, plus a query or
+two per product deleted since the order was placed. The dashboard
+reads only these tables, never the order items.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ecommerce.db import upsert_increment
+from orders.models import Order, OrderItem
+from .models import ProductDailySales, RolledUpOrder, SellerDailySales
+
+REVENUE = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def add_order(order_id):
+    """
+    Add an order to the rollups, unless it is already counted. Returns False
+    in that case.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                RolledUpOrder.objects.create(order_id=order_id)
+        except IntegrityError:
+            return False
+        created = Order.objects.filter(pk=order_id).values_list('created', flat=True).get()
+        day = timezone.localdate(created)
+        items = OrderItem.objects.filter(order_id=order_id, seller__isnull=False).values_list(
+            'product_id', 'product_name', 'seller_id', 'price', 'quantity',
+        )
+        sellers = defaultdict(lambda: {'units': 0, 'revenue': Decimal(0)})
+        products = []
+        deleted = defaultdict(lambda: {'units': 0, 'revenue': Decimal(0)})
+        for product_id, product_name, seller_id, price, quantity in items:
+            if product_id is None:
+                deleted[seller_id, product_name]['units'] += quantity
+                deleted[seller_id, product_name]['revenue'] += price * quantity
+            else:
+                products.append({
+                    'seller_id': seller_id, 'product_id': product_id, 'product_name': product_name, 'day': day,
+                    'units': quantity, 'revenue': price * quantity,
+                })
+            sellers[seller_id]['units'] += quantity
+            sellers[seller_id]['revenue'] += price * quantity
+        upsert_increment(
+            ProductDailySales, products,
+            unique_fields=['product_id', 'day'], increment_fields=['units', 'revenue'],
+        )
+        _add_deleted_products(day, deleted)
+        upsert_increment(
+            SellerDailySales,
+            [{'seller_id': seller_id, 'day': day, 'orders': 1, **totals} for seller_id, totals in sellers.items()],
+            unique_fields=['seller_id', 'day'], increment_fields=['orders', 'units', 'revenue'],
+        )
+    return True
+
+
+def _add_deleted_products(day, totals):
+    # The unique constraint does not cover a NULL product, so rows of deleted
+    # products are matched on (seller, name, day) by hand, as rebuild() groups them
+    for (seller_id, product_name), values in totals.items():
+        updated = ProductDailySales.objects.filter(
+            product=None, seller_id=seller_id, product_name=product_name, day=day,
+        ).update(units=F('units') + values['units'], revenue=F('revenue') + values['revenue'])
+        if not updated:
+            ProductDailySales.objects.create(seller_id=seller_id, product_name=product_name, day=day, **values)
+
+
+def rebuild(since=None, until=None):
+    """
+    Recompute the rollups of the days from ``since`` to ``until`` (both
+    included, open-ended when None) from the order items, in one transaction.
+    Returns the number of orders counted.
+    """
+    orders = Order.objects.all()
+    if since:
+        orders = orders.filter(created__date__gte=since)
+    if until:
+        orders = orders.filter(created__date__lte=until)
+
+    with transaction.atomic():
+        order_ids = list(orders.values_list('id', flat=True))
+        days = {}
+        if since:
+            days['day__gte'] = since
+        if until:
+            days['day__lte'] = until
+        ProductDailySales.objects.filter(**days).delete()
+        SellerDailySales.objects.filter(**days).delete()
+        RolledUpOrder.objects.filter(order__in=orders).delete()
+
+        items = (
+            OrderItem.objects.filter(order__in=orders, seller__isnull=False)
+            .annotate(day=TruncDate('created')).order_by()
+        )
+        ProductDailySales.objects.bulk_create([
+            ProductDailySales(product_name=row.pop('name'), **row) for row in
+            items.values('product_id', 'seller_id', 'day')
+            .annotate(name=Coalesce('product__name', 'product_name'), units=Sum('quantity'), revenue=Sum(REVENUE))
+        ], batch_size=1000)
+        SellerDailySales.objects.bulk_create([
+            SellerDailySales(**row) for row in
+            items.values('seller_id', 'day')
+            .annotate(orders=Count('order', distinct=True), units=Sum('quantity'), revenue=Sum(REVENUE))
+        ], batch_size=1000)
+        RolledUpOrder.objects.bulk_create([RolledUpOrder(order_id=order_id) for order_id in order_ids], batch_size=1000)
+    return len(order_ids)
+
+
+def seller_summary(seller, since, until, top=10):
+    """
+    Revenue, units, orders, average order value, daily figures and top
+    products of ``seller`` from ``since`` to ``until``, read from the rollups.
+    """
+    days = SellerDailySales.objects.filter(seller=seller, day__gte=since, day__lte=until).order_by('day')
+    totals = days.aggregate(revenue=Sum('revenue'), units=Sum('units'), orders=Sum('orders'))
+    totals = {name: value or 0 for name, value in totals.items()}
+    totals['average_order_value'] = totals['revenue'] / totals['orders'] if totals['orders'] else 0
+    # Live products under their current name, deleted ones under their last one
+    top_products = (
+        ProductDailySales.objects.filter(seller=seller, day__gte=since, day__lte=until)
+        .annotate(name=Coalesce('product__name', 'product_name'))
+        .values('product_id', 'name').order_by()
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'product_id')[:top]
+    )
+    return {
+        **totals,
+        'days': list(days.values('day', 'orders', 'units', 'revenue')),
+        'top_products': list(top_products),
+    }
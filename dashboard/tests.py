@@ -1,3 +1,75 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from orders.models import Order, OrderItem
+from shop.models import Brand, Category, Product
+from users.models import User
+from .models import ProductDailySales, SellerDailySales
+from .rollups import add_order, rebuild
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.sellers = [
+            User.objects.create_user(username=f'seller{i}', email=f'seller{i}@example.com', password='p', is_seller=True)
+            for i in range(2)
+        ]
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        category = Category.objects.create(name='Shoes', slug='shoes')
+        brand = Brand.objects.create(name='Acme', slug='acme')
+        self.products = [
+            Product.objects.create(
+                seller=self.sellers[i % 2], category=category, brand=brand, name=f'Shoe {i}', slug=f'shoe-{i}',
+                price=10 + i, stock=100,
+            )
+            for i in range(4)
+        ]
+
+    def place_order(self, quantity=1):
+        order = Order.objects.create(
+            user=self.buyer, full_name='Buyer', email='buyer@example.com', phone='1', postal_code='1',
+            city='City', country='Country', payment_method='card',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product=product, price=product.price, quantity=quantity, seller_id=product.seller_id,
+                product_name=product.name, product_slug=product.slug, created=order.created,
+            )
+            for product in self.products
+        ])
+        return order
+
+    def rollups(self):
+        return (
+            sorted(ProductDailySales.objects.values_list('product_id', 'seller_id', 'product_name', 'day', 'units', 'revenue'), key=str),
+            sorted(SellerDailySales.objects.values_list('seller_id', 'day', 'orders', 'units', 'revenue')),
+        )
+
+    def test_deleted_products_stay_with_their_seller(self):
+        orders = [self.place_order(quantity) for quantity in (1, 2)]
+        # Deleted before the events are handled: the items lose their product
+        for product in self.products[:3]:
+            product.delete()
+        for order in orders:
+            self.assertTrue(add_order(order.pk))
+
+        deleted = ProductDailySales.objects.filter(product=None)
+        self.assertEqual(
+            sorted(deleted.values_list('seller_id', 'product_name', 'units', 'revenue')),
+            [
+                (self.sellers[0].pk, 'Shoe 0', 3, Decimal('30.00')),
+                (self.sellers[0].pk, 'Shoe 2', 3, Decimal('36.00')),
+                (self.sellers[1].pk, 'Shoe 1', 3, Decimal('33.00')),
+            ],
+        )
+        incremental = self.rollups()
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_order_is_counted_once(self):
+        order = self.place_order()
+        self.assertTrue(add_order(order.pk))
+        self.assertFalse(add_order(order.pk))
+        self.assertEqual(SellerDailySales.objects.get(seller=self.sellers[0]).orders, 1)
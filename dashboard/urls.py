@@ -7,6 +7,10 @@ urlpatterns = [
     path('', views.dashboard_home, name='home'),
     path('products/', views.product_list, name='product_list'),
     path('products/add/', views.product_add, name='product_add'),
+    path('orders/', views.order_items, name='order_items'),
+    path('products/import/', views.product_import, name='product_import'),
+    path('export/products/', views.export_products, name='export_products'),
+    path('export/orders/', views.export_orders, name='export_orders'),
     path('products/edit/<int:product_id>/', views.product_edit, name='product_edit'),
     path('products/delete/<int:product_id>/', views.product_delete, name='product_delete'),
 ]
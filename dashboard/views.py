@@ -1,10 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
 from functools import wraps
 
+from orders.models import OrderItem
 from shop.models import Product
-from .forms import ProductForm
+from shop.pagination import KeysetPaginator
+from shop.search import search_products
+from . import bulk
+from .forms import ProductBulkForm, ProductForm, ProductImportForm
+from .exports import FORMATS as EXPORT_FORMATS, iter_rows, seller_order_items, seller_products, stream_csv, stream_jsonl
+from .importers import ProductImporter, read_rows
+from .rollups import seller_summary
 
 # Custom decorator to check if user is a seller
 def seller_required(view_func):
@@ -19,14 +30,83 @@ def seller_required(view_func):
 @login_required
 @seller_required
 def dashboard_home(request):
-    products = Product.objects.filter(seller=request.user)
-    return render(request, 'dashboard/home.html', {'products': products})
+    # Sales come from the daily rollups, see dashboard/rollups.py
+    today = timezone.localdate()
+    try:
+        since = _date_param(request, 'since') or today - timedelta(days=29)
+        until = _date_param(request, 'until') or today
+    except ValueError:
+        messages.error(request, 'Invalid date range.')
+        since, until = today - timedelta(days=29), today
+    return render(request, 'dashboard/home.html', {
+        'product_count': Product.objects.filter(seller=request.user).count(),
+        'since': since,
+        'until': until,
+        'sales': seller_summary(request.user, since, until),
+    })
+
+# ?sort= options of the product table; the last field must be unique
+PRODUCT_SORTS = {
+    'name': ('name', 'id'),
+    '-name': ('-name', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'stock': ('stock', 'id'),
+    '-stock': ('-stock', '-id'),
+    'created': ('created', 'id'),
+    '-created': ('-created', '-id'),
+    'relevance': ('search_rank', 'id'),
+}
 
 @login_required
 @seller_required
 def product_list(request):
-    products = Product.objects.filter(seller=request.user)
-    return render(request, 'dashboard/product_list.html', {'products': products})
+    if request.method == 'POST':
+        return _bulk_update(request)
+
+    products = (
+        Product.objects.filter(seller=request.user)
+        .select_related('category', 'brand').prefetch_related('stock_shards').defer('description')
+    )
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        products = search_products(products, search_query)
+    sort_by = request.GET.get('sort') or ('relevance' if search_query else 'name')
+    if sort_by not in PRODUCT_SORTS or (sort_by == 'relevance' and not search_query):
+        sort_by = 'name'
+    page_obj = KeysetPaginator(products, PRODUCT_SORTS[sort_by], per_page=50).get_page(request.GET.get('cursor'))
+    return render(request, 'dashboard/product_list.html', {
+        'page_obj': page_obj,
+        'search_query': search_query,
+        'sort_by': sort_by,
+        'bulk_form': ProductBulkForm(),
+    })
+
+def _bulk_update(request):
+    form = ProductBulkForm(request.POST)
+    if form.is_valid():
+        data = form.cleaned_data
+        updated = bulk.apply(
+            request.user, data['products'], data['action'], stock=data['stock'], percent=data['percent'],
+        )
+        messages.success(request, f'{updated} product(s) updated.')
+    else:
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+    # Back to the same page, search and sort
+    return redirect(request.get_full_path())
+
+@login_required
+@seller_required
+def order_items(request):
+    # Newest first straight from the (seller, created) index, no COUNT(*)
+    items = (
+        OrderItem.objects.filter(seller=request.user).select_related('order')
+        .only('order__order_number', 'order__paid', 'created', 'product_name', 'price', 'quantity')
+    )
+    page_obj = KeysetPaginator(items, ('-created', '-id'), per_page=50).get_page(request.GET.get('cursor'))
+    return render(request, 'dashboard/order_items.html', {'page_obj': page_obj})
 
 @login_required
 @seller_required
@@ -65,4 +145,71 @@ def product_delete(request, product_id):
         product.delete()
         messages.success(request, 'Product deleted successfully.')
         return redirect('dashboard:product_list')
-    return render(request, 'dashboard/product_confirm_delete.html', {'product': product})
\ No newline at end of file
+    return render(request, 'dashboard/product_confirm_delete.html', {'product': product})
+
+@login_required
+@seller_required
+def product_import(request):
+    report = None
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            importer = ProductImporter(request.user)
+            report = importer.run(read_rows(upload.file, form.cleaned_data['format']))
+            if report.failed:
+                messages.warning(request, f'{report.failed} row(s) could not be imported.')
+            else:
+                messages.success(request, 'Products imported successfully.')
+    else:
+        form = ProductImportForm()
+    return render(request, 'dashboard/product_import.html', {'form': form, 'report': report})
+
+
+@login_required
+@seller_required
+def export_products(request):
+    return _export(request, seller_products, 'products')
+
+
+@login_required
+@seller_required
+def export_orders(request):
+    return _export(request, seller_order_items, 'order-items')
+
+
+def _export(request, source, name):
+    """
+    Stream a seller export as CSV or JSON Lines.
+
+    Query parameters: ``format``, ``since``/``until`` (YYYY-MM-DD) and ``after``,
+    the last id already received, to resume an interrupted download.
+    """
+    file_format = request.GET.get('format', 'csv')
+    try:
+        since = _date_param(request, 'since')
+        until = _date_param(request, 'until')
+        after = int(request.GET['after']) if request.GET.get('after') else None
+    except ValueError:
+        return HttpResponseBadRequest('Invalid since, until or after parameter.')
+    if file_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unknown format.')
+
+    queryset, columns = source(request.user, since, until)
+    rows = iter_rows(queryset, columns, after=after)
+    if file_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(columns, rows), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(stream_jsonl(columns, rows), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{name}.{file_format}"'
+    return response
+
+
+def _date_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+    date = parse_date(value)
+    if date is None:
+        raise ValueError(value)
+    return date
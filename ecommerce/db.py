@@ -0,0 +1,70 @@
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import F
+
+
+def upsert_increment(model, rows, unique_fields, increment_fields):
+    """
+    Insert ``rows`` (dicts of field name -> value) or, for rows whose
+    ``unique_fields`` already exist, add their ``increment_fields`` to the stored
+    values. ``unique_fields`` must be covered by a unique constraint.
+
+    On SQLite and PostgreSQL this is a single
+    ``INSERT ... ON CONFLICT (...) DO UPDATE SET f = f + excluded.f`` statement.
+    Other backends fall back to an F() update followed by an insert.
+    """
+    # One row per key, a statement may not touch the same row twice
+    merged = {}
+    for row in rows:
+        key = tuple(_db_value(row[name]) for name in unique_fields)
+        if key in merged:
+            for name in increment_fields:
+                merged[key][name] += row[name]
+        else:
+            merged[key] = dict(row)
+    if not merged:
+        return
+
+    using = router.db_for_write(model)
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        _upsert_increment_fallback(model, merged.values(), unique_fields, increment_fields, using)
+        return
+
+    opts = model._meta
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    names = list(next(iter(merged.values())))
+    fields = [opts.get_field(name) for name in names]
+    columns = ', '.join(qn(field.column) for field in fields)
+    conflict = ', '.join(qn(opts.get_field(name).column) for name in unique_fields)
+    updates = ', '.join(
+        f'{qn(column)} = {table}.{qn(column)} + excluded.{qn(column)}'
+        for column in (opts.get_field(name).column for name in increment_fields)
+    )
+    placeholders = ', '.join(['(%s)' % ', '.join(['%s'] * len(fields))] * len(merged))
+    params = []
+    for row in merged.values():
+        params.extend(field.get_db_prep_save(_db_value(row[name]), connection) for name, field in zip(names, fields))
+    sql = f'INSERT INTO {table} ({columns}) VALUES {placeholders} ON CONFLICT ({conflict}) DO UPDATE SET {updates}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _db_value(value):
+    return value.pk if isinstance(value, models.Model) else value
+
+
+def _upsert_increment_fallback(model, rows, unique_fields, increment_fields, using):
+    manager = model._default_manager.db_manager(using)
+    with transaction.atomic(using=using):
+        for row in rows:
+            lookup = {name: row[name] for name in unique_fields}
+            increments = {name: F(name) + row[name] for name in increment_fields}
+            if manager.filter(**lookup).update(**increments):
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    manager.create(**row)
+            except IntegrityError:
+                # Inserted concurrently in the meantime
+                manager.filter(**lookup).update(**increments)
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 
     'dashboard.apps.DashboardConfig',
     'api_v1.apps.ApiV1Config', # Added for API v1
+    'inventory.apps.InventoryConfig',
+    'outbox.apps.OutboxConfig',
 
     'allauth',
     'allauth.account',
@@ -147,6 +149,15 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+# Navigation data and other versioned caches live here. Use a shared backend
+# (Redis/Memcached) in production so version bumps reach every worker; with
+# LocMemCache each process rebuilds the menus every minute instead.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -182,6 +193,45 @@ SOCIALACCOUNT_PROVIDERS = {
 
 
 CART_SESSION_ID = 'cart'
+# Storage of anonymous carts, see cart/storage.py. Carts of signed-in users are
+# kept in the database. 'cart.storage.CacheCartStorage' is an option once CACHES
+# points to a shared, persistent backend (Redis/Memcached).
+CART_ANONYMOUS_STORAGE = 'cart.storage.AnonymousDatabaseCartStorage'
+CART_ANONYMOUS_TTL = 60 * 60 * 24 * 30  # purged by `manage.py purge_anonymous_carts`
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Product search backend, see shop/search.py
+SHOP_SEARCH_BACKEND = 'shop.search.SQLiteFTS5Backend'
+
+# How long stock stays reserved for a user on the payment page, in seconds.
+# Expired reservations are given back by `manage.py release_expired_reservations`.
+INVENTORY_RESERVATION_TTL = 15 * 60
+
+# Checkout admission control, see orders/admission.py. Keep the per-process
+# limit below the number of worker threads so browsing always has capacity.
+# The cluster limit and the queue live in the default cache: it only spans the
+# cluster with a shared backend (Redis/Memcached), LocMemCache makes it per process.
+CHECKOUT_MAX_CONCURRENCY = 8
+CHECKOUT_PROCESS_CONCURRENCY = 2
+CHECKOUT_QUEUE_SIZE = 500
+CHECKOUT_SLOT_LEASE = 30  # seconds
+CHECKOUT_TICKET_TTL = 20  # seconds a ticket lives without being polled, or keeps its slot once let in
+
+# Products at or below this stock are reported to their seller after an order
+INVENTORY_LOW_STOCK_THRESHOLD = 5
+
+# Post-checkout work (emails, alerts) runs from the outbox, see outbox/worker.py.
+# Start the worker with `manage.py run_outbox_worker`.
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_CONCURRENCY = 4  # handler threads per worker
+OUTBOX_LEASE = 60  # seconds a claimed event stays with its worker, renewed as its handler starts
+OUTBOX_MAX_ATTEMPTS = 8  # then the event goes to the dead letters
+OUTBOX_BACKOFF_BASE = 5  # seconds before the first retry, doubled after each failure
+OUTBOX_BACKOFF_MAX = 60 * 60
+
+# Emails are printed to the console in development
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'no-reply@localhost'
 
 CORS_ORIGIN_ALLOW_ALL = True
 
@@ -197,6 +247,13 @@ REST_FRAMEWORK = {
     ]
 }
 
+# How long responses to requests with an Idempotency-Key header are kept, in
+# seconds. Expired keys are deleted by `manage.py purge_idempotency_keys`.
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+# Seconds a key stays locked by a request that has not answered yet; after
+# that a retry runs again. Keep it above the request timeout.
+IDEMPOTENCY_LEASE = 60
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
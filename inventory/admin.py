@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import StockReservation, StockShard
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'user', 'quantity', 'created', 'expires_at']
+    list_select_related = ['product', 'user']
+    raw_id_fields = ['product', 'user']
+
+@admin.register(StockShard)
+class StockShardAdmin(admin.ModelAdmin):
+    list_display = ['product', 'shard', 'count']
+    list_select_related = ['product']
+    raw_id_fields = ['product']
@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+
+from orders.models import OrderItem
+from outbox.events import handler
+from shop.models import Product
+from .shards import shard_totals
+
+
+@handler('order.placed')
+def alert_low_stock(payload):
+    """
+    Tell sellers which products of the order are running out.
+    """
+    product_ids = OrderItem.objects.filter(order_id=payload['order_id']).values_list('product_id', flat=True)
+    products = list(
+        Product.objects.filter(id__in=product_ids, seller__isnull=False)
+        .select_related('seller').only('name', 'stock', 'stock_sharded', 'seller__email')
+    )
+    totals = shard_totals([product.id for product in products if product.stock_sharded])
+    by_seller = defaultdict(list)
+    for product in products:
+        product.units = totals.get(product.id, 0) if product.stock_sharded else product.stock
+        if product.units <= settings.INVENTORY_LOW_STOCK_THRESHOLD:
+            by_seller[product.seller].append(product)
+    messages = [
+        EmailMessage(
+            'Products running low on stock',
+            render_to_string('inventory/emails/low_stock.txt', {'products': seller_products}),
+            settings.DEFAULT_FROM_EMAIL,
+            [seller.email],
+        )
+        for seller, seller_products in by_seller.items()
+    ]
+    if messages:
+        get_connection().send_messages(messages)
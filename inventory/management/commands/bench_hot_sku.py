@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from inventory.services import InsufficientStock, take_stock
+from inventory.shards import shard_stock
+from shop.models import Brand, Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrent checkouts of one hot product, with and without sharded stock. '
+        'Creates its own products in the configured database and deletes them afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--checkouts', type=int, default=2000, help='Checkouts per run, split across threads.')
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            username='bench-hot-sku', email='bench-hot-sku@example.com', password=None,
+        )
+        category = Category.objects.create(name='Bench hot SKU', slug='bench-hot-sku')
+        brand = Brand.objects.create(name='Bench hot SKU', slug='bench-hot-sku')
+        try:
+            for sharded in (False, True):
+                product = Product.objects.create(
+                    seller=user, category=category, brand=brand, name='Bench hot SKU', slug='bench-hot-sku',
+                    price=1, stock=options['checkouts'],
+                )
+                if sharded:
+                    shard_stock(product.pk, options['shards'])
+                self.run(product, options, 'sharded' if sharded else 'single row')
+        finally:
+            Product.objects.filter(category=category).delete()
+            category.delete()
+            brand.delete()
+            user.delete()
+
+    def run(self, product, options, label):
+        threads = options['threads']
+        per_thread = options['checkouts'] // threads
+
+        def worker(_):
+            done = retries = 0
+            try:
+                while done < per_thread:
+                    try:
+                        with transaction.atomic():
+                            take_stock({product.pk: 1})
+                        done += 1
+                    except OperationalError:
+                        # SQLite "database is locked"
+                        retries += 1
+                    except InsufficientStock:
+                        break
+            finally:
+                connection.close()
+            return done, retries
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(worker, range(threads)))
+        elapsed = time.perf_counter() - start
+
+        done = sum(result[0] for result in results)
+        retries = sum(result[1] for result in results)
+        product.refresh_from_db()
+        self.stdout.write(
+            f'{label:>10}: {done} checkouts in {elapsed:.2f}s, {done / elapsed:.0f}/s, '
+            f'{retries} lock retries, {product.available_stock} left'
+        )
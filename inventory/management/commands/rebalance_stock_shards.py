@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.shards import rebalance
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Even out the stock shards of every sharded product and refresh Product.stock.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running, rebalancing every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=10)
+
+    def handle(self, *args, **options):
+        while True:
+            product_ids = list(Product.objects.filter(stock_sharded=True).values_list('id', flat=True))
+            for product_id in product_ids:
+                rebalance(product_id)
+            if not options['loop']:
+                self.stdout.write(f'Rebalanced {len(product_ids)} products.')
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.services import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Give back the stock held by expired reservations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep running, sweeping every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations(batch_size=options['batch_size'])
+            if released or not options['loop']:
+                self.stdout.write(f'Released {released} expired reservations.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventory.shards import DEFAULT_SHARDS, shard_stock, unshard_stock
+
+
+class Command(BaseCommand):
+    help = 'Split the stock of hot products across counter shards, or merge it back with --disable.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='+', type=int)
+        parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS)
+        parser.add_argument('--disable', action='store_true')
+
+    def handle(self, *args, **options):
+        for product_id in options['product_ids']:
+            if options['disable']:
+                unshard_stock(product_id)
+                self.stdout.write(f'Product {product_id}: stock merged back.')
+            else:
+                shard_stock(product_id, options['shards'])
+                self.stdout.write(f"Product {product_id}: stock split across {options['shards']} shards.")
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db import models
+from shop.models import Product
+
+
+class StockReservation(models.Model):
+    """
+    Stock taken out of ``Product.stock`` for a user on the payment page. It is
+    either consumed by the order or given back once ``expires_at`` has passed.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ('expires_at',)
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product_id} for {self.user_id}'
+
+
+class StockShard(models.Model):
+    """
+    One of the counters holding the stock of a product with ``stock_sharded``
+    set. Checkouts decrement a random shard, so they do not all wait on the same
+    row.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='unique_stock_shard'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}#{self.shard}: {self.count}'
@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from shop.models import Product
+from .models import StockReservation
+from .shards import give_back_to_shards, shard_totals, take_from_shards
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when some products do not have enough stock, ``shortages`` lists them:
+    ``[{'product_id': ..., 'name': ..., 'requested': ..., 'available': ...}]``.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(', '.join(
+            f"{shortage['name']}: {shortage['requested']} requested, {shortage['available']} available"
+            for shortage in shortages
+        ))
+
+
+def _per_product(lines):
+    # CASE id WHEN ... THEN quantity, so a whole order is one statement
+    return Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in lines.items()],
+        output_field=IntegerField(),
+    )
+
+
+def take_stock(lines):
+    """
+    Decrement the stock of every product in ``lines`` (``{product_id: quantity}``)
+    with a single conditional UPDATE: ``stock = stock - n WHERE stock >= n``.
+
+    Either every product is decremented or InsufficientStock is raised and
+    nothing is, so no row stays locked while the shortage is reported.
+    """
+    lines = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+    if not lines:
+        return
+    with transaction.atomic():
+        requested = _per_product(lines)
+        updated = Product.objects.filter(id__in=lines, stock_sharded=False, stock__gte=requested).update(
+            stock=F('stock') - requested, updated=Now(),
+        )
+        if updated == len(lines):
+            return
+        # Sharded products are left out of the UPDATE above, take them from their shards
+        sharded = set(Product.objects.filter(id__in=lines, stock_sharded=True).values_list('id', flat=True))
+        if updated + len(sharded) == len(lines):
+            short = [product_id for product_id in sharded if not take_from_shards(product_id, lines[product_id])]
+            if not short:
+                return
+        raise InsufficientStock(get_shortages(lines))
+
+
+def give_back_stock(lines):
+    """
+    Return stock taken by take_stock(), in one UPDATE.
+    """
+    lines = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+    if not lines:
+        return
+    updated = Product.objects.filter(id__in=lines, stock_sharded=False).update(
+        stock=F('stock') + _per_product(lines), updated=Now(),
+    )
+    if updated != len(lines):
+        for product_id in Product.objects.filter(id__in=lines, stock_sharded=True).values_list('id', flat=True):
+            give_back_to_shards(product_id, lines[product_id])
+
+
+def get_shortages(lines):
+    products = list(Product.objects.filter(id__in=lines).values_list('id', 'name', 'stock', 'stock_sharded'))
+    totals = shard_totals([product_id for product_id, _, _, sharded in products if sharded])
+    found = {
+        product_id: (name, totals.get(product_id, 0) if sharded else stock)
+        for product_id, name, stock, sharded in products
+    }
+    shortages = []
+    for product_id, quantity in lines.items():
+        name, stock = found.get(product_id, ('', 0))
+        if stock < quantity:
+            shortages.append({'product_id': product_id, 'name': name, 'requested': quantity, 'available': stock})
+    return shortages
+
+
+def reserve_stock(user, lines, ttl=None):
+    """
+    Hold the stock of ``lines`` for ``user`` for ``ttl`` seconds
+    (INVENTORY_RESERVATION_TTL by default), replacing their previous reservations.
+    """
+    ttl = settings.INVENTORY_RESERVATION_TTL if ttl is None else ttl
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    with transaction.atomic():
+        held = _pop_reservations(StockReservation.objects.filter(user=user))
+        _adjust_stock(lines, held)
+        StockReservation.objects.bulk_create([
+            StockReservation(user=user, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in lines.items() if quantity > 0
+        ])
+
+
+def consume_stock(user, lines):
+    """
+    Take the stock of an order: the user's reservations are used up and only
+    the part they do not cover is decremented. Call it inside the transaction
+    that creates the order.
+    """
+    with transaction.atomic():
+        held = _pop_reservations(StockReservation.objects.filter(user=user))
+        _adjust_stock(lines, held)
+
+
+def release_reservations(queryset):
+    """
+    Delete the reservations of ``queryset`` and give their stock back.
+    Returns the ``{product_id: quantity}`` given back.
+    """
+    with transaction.atomic():
+        held = _pop_reservations(queryset)
+        give_back_stock(held)
+    return held
+
+
+def release_expired_reservations(batch_size=500):
+    """
+    Give back the stock of every expired reservation, ``batch_size`` at a time.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                StockReservation.objects.filter(expires_at__lte=timezone.now())
+                .select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return released
+            held = _pop_reservations(StockReservation.objects.filter(id__in=ids))
+            give_back_stock(held)
+            released += len(ids)
+
+
+def _adjust_stock(lines, held):
+    # Only the difference with what is already held touches the products
+    try:
+        take_stock({product_id: quantity - held.get(product_id, 0) for product_id, quantity in lines.items()})
+    except InsufficientStock as e:
+        for shortage in e.shortages:
+            shortage['requested'] += held.get(shortage['product_id'], 0)
+            shortage['available'] += held.get(shortage['product_id'], 0)
+        raise
+    give_back_stock({product_id: quantity - lines.get(product_id, 0) for product_id, quantity in held.items()})
+
+
+def _pop_reservations(queryset):
+    """
+    Delete the reservations of ``queryset``, returns ``{product_id: quantity}``
+    they were holding. Must run in a transaction.
+    """
+    rows = list(queryset.select_for_update().values_list('id', 'product_id', 'quantity'))
+    if not rows:
+        return {}
+    StockReservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+    held = {}
+    for _, product_id, quantity in rows:
+        held[product_id] = held.get(product_id, 0) + quantity
+    return held
@@ -0,0 +1,137 @@
+"""
+Sharded stock counters for hot products.
+
+A product with ``stock_sharded`` keeps its stock in N StockShard rows instead
+of ``Product.stock``. Each checkout decrements one random shard, so concurrent
+checkouts of the same product mostly update different rows and never the
+product row itself. The rebalancer evens the shards out again and copies the
+total into ``Product.stock`` (and bumps ``updated``) for display.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Now
+
+from ecommerce.db import upsert_increment
+from shop.models import Product
+from .models import StockShard
+
+DEFAULT_SHARDS = 8
+
+
+def shard_stock(product_id, shards=DEFAULT_SHARDS):
+    """
+    Move the stock of a product into ``shards`` counters.
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product_id)
+        if product.stock_sharded:
+            return rebalance(product_id, shards)
+        StockShard.objects.bulk_create([
+            StockShard(product=product, shard=shard, count=count)
+            for shard, count in enumerate(_split(product.stock, shards))
+        ])
+        Product.objects.filter(pk=product_id).update(stock_sharded=True, updated=Now())
+
+
+def unshard_stock(product_id):
+    """
+    Move the stock of a sharded product back into ``Product.stock``.
+    """
+    with transaction.atomic():
+        Product.objects.select_for_update().get(pk=product_id)
+        total = sum(row.count for row in _lock_shards(product_id))
+        StockShard.objects.filter(product_id=product_id).delete()
+        Product.objects.filter(pk=product_id).update(stock=total, stock_sharded=False, updated=Now())
+
+
+def rebalance(product_id, shards=None):
+    """
+    Spread the stock of a sharded product evenly over its shards again and
+    refresh ``Product.stock``. Returns the total.
+    """
+    with transaction.atomic():
+        rows = list(_lock_shards(product_id))
+        total = sum(row.count for row in rows)
+        _respread(product_id, total, shards or len(rows) or DEFAULT_SHARDS)
+    return total
+
+
+def reset_stock(product_id, total):
+    """
+    Replace the stock of a sharded product with ``total``, spread evenly over
+    its shards. Writing ``Product.stock`` alone would be ignored by checkout
+    and overwritten by the rebalancer.
+    """
+    with transaction.atomic():
+        rows = list(_lock_shards(product_id))
+        _respread(product_id, total, len(rows) or DEFAULT_SHARDS)
+
+
+def _respread(product_id, total, shards):
+    StockShard.objects.filter(product_id=product_id).delete()
+    StockShard.objects.bulk_create([
+        StockShard(product_id=product_id, shard=shard, count=count)
+        for shard, count in enumerate(_split(total, shards))
+    ])
+    Product.objects.filter(pk=product_id).update(stock=total, updated=Now())
+
+
+def take_from_shards(product_id, quantity):
+    """
+    Decrement ``quantity`` units from the shards of a product. Returns False,
+    without changing anything, if they hold less than that in total.
+    """
+    shards = list(StockShard.objects.filter(product_id=product_id).values_list('shard', flat=True))
+    random.shuffle(shards)
+    # Usually a single random shard covers the quantity, no lock needed
+    for shard in shards[:2]:
+        taken = StockShard.objects.filter(product_id=product_id, shard=shard, count__gte=quantity).update(
+            count=F('count') - quantity,
+        )
+        if taken:
+            return True
+
+    # Otherwise drain several shards under lock
+    with transaction.atomic():
+        rows = list(_lock_shards(product_id))
+        if sum(row.count for row in rows) < quantity:
+            return False
+        remaining = quantity
+        for row in sorted(rows, key=lambda row: -row.count):
+            taken = min(row.count, remaining)
+            row.count -= taken
+            remaining -= taken
+            if not remaining:
+                break
+        StockShard.objects.bulk_update(rows, ['count'])
+    return True
+
+
+def give_back_to_shards(product_id, quantity):
+    # Returns are rare compared to checkouts, they all go to the first shard
+    upsert_increment(
+        StockShard, [{'product_id': product_id, 'shard': 0, 'count': quantity}],
+        unique_fields=['product_id', 'shard'], increment_fields=['count'],
+    )
+
+
+def shard_totals(product_ids):
+    """
+    ``{product_id: units in stock}`` for sharded products.
+    """
+    rows = (
+        StockShard.objects.filter(product_id__in=product_ids).order_by()
+        .values_list('product_id').annotate(total=Sum('count'))
+    )
+    return dict(rows)
+
+
+def _lock_shards(product_id):
+    return StockShard.objects.select_for_update().filter(product_id=product_id).order_by('shard')
+
+
+def _split(total, shards):
+    share, extra = divmod(total, shards)
+    return [share + (1 if shard < extra else 0) for shard in range(shards)]
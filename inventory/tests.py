@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from shop.models import Brand, Category, Product
+from users.models import User
+from .models import StockReservation
+from .services import InsufficientStock, consume_stock, release_expired_reservations, reserve_stock
+from .shards import shard_stock
+
+
+class StockTests(TestCase):
+
+    def setUp(self):
+        seller = User.objects.create_user(username='seller', email='seller@example.com', password='p', is_seller=True)
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='p')
+        category = Category.objects.create(name='Shoes', slug='shoes')
+        brand = Brand.objects.create(name='Acme', slug='acme')
+        self.shoe, self.boot = [
+            Product.objects.create(
+                seller=seller, category=category, brand=brand, name=name, slug=name.lower(), price=10, stock=5,
+            )
+            for name in ('Shoe', 'Boot')
+        ]
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.available_stock
+
+    def test_reservation_counts_toward_checkout(self):
+        reserve_stock(self.buyer, {self.shoe.pk: 3})
+        self.assertEqual(self.stock(self.shoe), 2)
+
+        # Held for the buyer, so another checkout cannot take it
+        with self.assertRaises(InsufficientStock):
+            consume_stock(self.other, {self.shoe.pk: 3})
+
+        # The buyer's order uses the reservation and only takes the extra unit
+        consume_stock(self.buyer, {self.shoe.pk: 4})
+        self.assertEqual(self.stock(self.shoe), 1)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_reservation_is_given_back(self):
+        reserve_stock(self.buyer, {self.shoe.pk: 3})
+        reserve_stock(self.other, {self.boot.pk: 2})
+        StockReservation.objects.filter(user=self.buyer).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(self.stock(self.shoe), 5)
+        self.assertEqual(self.stock(self.boot), 3)
+        self.assertEqual(list(StockReservation.objects.values_list('user', flat=True)), [self.other.pk])
+
+    def test_oversell_reports_shortages_and_changes_nothing(self):
+        shard_stock(self.boot.pk, 2)
+        with self.assertRaises(InsufficientStock) as raised:
+            consume_stock(self.buyer, {self.shoe.pk: 2, self.boot.pk: 7})
+        self.assertEqual(raised.exception.shortages, [
+            {'product_id': self.boot.pk, 'name': 'Boot', 'requested': 7, 'available': 5},
+        ])
+        self.assertEqual(self.stock(self.shoe), 5)
+        self.assertEqual(self.stock(self.boot), 5)
+
+    def test_oversell_counts_the_users_reservation(self):
+        reserve_stock(self.buyer, {self.shoe.pk: 2})
+        with self.assertRaises(InsufficientStock) as raised:
+            consume_stock(self.buyer, {self.shoe.pk: 6})
+        self.assertEqual(raised.exception.shortages, [
+            {'product_id': self.shoe.pk, 'name': 'Shoe', 'requested': 6, 'available': 5},
+        ])
+        # The failed checkout rolled back, the reservation still holds
+        self.assertEqual(self.stock(self.shoe), 3)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
@@ -0,0 +1,194 @@
+"""
+Admission control for checkout.
+
+A checkout runs only when it gets both a slot of this process
+(CHECKOUT_PROCESS_CONCURRENCY, a semaphore) and a slot of the cluster
+(CHECKOUT_MAX_CONCURRENCY leases in the Django cache). Everything else is
+answered at once with 429 and a ticket in a bounded FIFO queue, so workers are
+never tied up waiting and keep serving the catalog.
+
+Tickets are numbered, ``head`` is the last ticket let in. Letting a ticket in
+reserves a cluster slot for it (a lease of CHECKOUT_TICKET_TTL seconds), which
+its holder takes over on the next attempt, so no more tickets are let in than
+there are free slots and they are served in order. Tickets whose holder
+stopped polling are skipped. While tickets are waiting, requests without one
+join the queue instead of jumping it.
+
+The cluster-wide state lives in the ``default`` cache, which must be shared
+by every process (Redis, Memcached) for CHECKOUT_MAX_CONCURRENCY to hold
+across the cluster. With the local-memory cache it is a per-process limit.
+"""
+import random
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = 'checkout:'
+HEAD_KEY = f'{PREFIX}head'
+TAIL_KEY = f'{PREFIX}tail'
+
+_process_slots = None
+_process_slots_lock = threading.Lock()
+
+
+class CheckoutBusy(Exception):
+    """
+    No checkout slot is free. ``ticket`` is the caller's place in the queue
+    (None when the queue is full), to be sent back with the next attempt.
+    """
+
+    def __init__(self, ticket, position):
+        self.ticket = ticket
+        self.position = position
+        self.retry_after = retry_after(position)
+        super().__init__(f'Checkout is busy, position {position}.')
+
+
+def retry_after(position):
+    # Roughly one round of slots per second
+    return min(1 + position // max(settings.CHECKOUT_MAX_CONCURRENCY, 1), 30)
+
+
+@contextmanager
+def checkout_slot(ticket=None):
+    """
+    Run the block holding a checkout slot or raise CheckoutBusy right away.
+    """
+    slot = admit(ticket)
+    try:
+        yield
+    finally:
+        release(slot)
+
+
+def admit(ticket=None):
+    if ticket is not None:
+        _keep_alive(ticket)
+    head = advance()
+    tail = cache.get(TAIL_KEY, 0)
+    if ticket is None and tail > head:
+        # Others are already waiting
+        raise CheckoutBusy(*_enqueue(head, tail))
+    if ticket is not None and ticket > head:
+        raise CheckoutBusy(ticket, ticket - head)
+
+    slot = _acquire(ticket)
+    if slot is None:
+        if ticket is not None and _find_grant(ticket):
+            # Only this process is full, the reserved slot waits for the retry
+            raise CheckoutBusy(ticket, 0)
+        raise CheckoutBusy(*_enqueue(head, tail))
+    return slot
+
+
+def release(slot):
+    local, key, token = slot
+    if cache.get(key) == token:
+        cache.delete(key)
+    local.release()
+    advance()
+
+
+def status(ticket):
+    """
+    Position of a ticket in the queue, 0 when its holder may retry. Polling
+    keeps the ticket alive.
+    """
+    _keep_alive(ticket)
+    return max(ticket - advance(), 0)
+
+
+def advance():
+    """
+    Let waiting live tickets in, in order, reserving a free cluster slot for
+    each. Returns the head.
+    """
+    counters = cache.get_many([HEAD_KEY, TAIL_KEY])
+    head, tail = counters.get(HEAD_KEY, 0), counters.get(TAIL_KEY, 0)
+    if head >= tail or len(cache.get_many(_slot_keys())) >= settings.CHECKOUT_MAX_CONCURRENCY:
+        return head
+    tickets = range(head + 1, tail + 1)
+    alive = cache.get_many([_alive_key(ticket) for ticket in tickets])
+    new_head = head
+    for ticket in tickets:
+        if _alive_key(ticket) in alive and not _grant(ticket):
+            break
+        new_head = ticket
+    if new_head != head:
+        cache.set(HEAD_KEY, new_head, None)
+    return new_head
+
+
+def _enqueue(head, tail):
+    if tail - head >= settings.CHECKOUT_QUEUE_SIZE:
+        return None, tail - head
+    cache.add(TAIL_KEY, 0, None)
+    ticket = cache.incr(TAIL_KEY)
+    _keep_alive(ticket)
+    return ticket, ticket - head
+
+
+def _keep_alive(ticket):
+    cache.set(_alive_key(ticket), True, settings.CHECKOUT_TICKET_TTL)
+
+
+def _grant(ticket):
+    # Leases expire by themselves if the process dies while holding one
+    marker = _grant_marker(ticket)
+    return any(
+        cache.add(key, marker, settings.CHECKOUT_TICKET_TTL) for key in _shuffled_slot_keys()
+    )
+
+
+def _find_grant(ticket):
+    marker = _grant_marker(ticket)
+    for key, value in cache.get_many(_slot_keys()).items():
+        if value == marker:
+            return key
+    return None
+
+
+def _acquire(ticket=None):
+    local = _get_process_slots()
+    if not local.acquire(blocking=False):
+        return None
+    token = uuid.uuid4().hex
+    # A ticket let in takes over the slot reserved for it
+    key = _find_grant(ticket) if ticket is not None else None
+    if key is not None:
+        cache.set(key, token, settings.CHECKOUT_SLOT_LEASE)
+        return local, key, token
+    for key in _shuffled_slot_keys():
+        if cache.add(key, token, settings.CHECKOUT_SLOT_LEASE):
+            return local, key, token
+    local.release()
+    return None
+
+
+def _get_process_slots():
+    global _process_slots
+    with _process_slots_lock:
+        if _process_slots is None:
+            _process_slots = threading.BoundedSemaphore(settings.CHECKOUT_PROCESS_CONCURRENCY)
+    return _process_slots
+
+
+def _slot_keys():
+    return [f'{PREFIX}slot:{i}' for i in range(settings.CHECKOUT_MAX_CONCURRENCY)]
+
+
+def _shuffled_slot_keys():
+    keys = _slot_keys()
+    random.shuffle(keys)
+    return keys
+
+
+def _grant_marker(ticket):
+    return f'ticket:{ticket}'
+
+
+def _alive_key(ticket):
+    return f'{PREFIX}ticket:{ticket}'
@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.template.loader import render_to_string
+
+from outbox.events import handler
+from .models import Order, OrderItem
+
+
+@handler('order.placed')
+def send_order_confirmation(payload):
+    order = Order.objects.get(pk=payload['order_id'])
+    items = OrderItem.objects.filter(order=order).order_by('id')
+    send_mail(
+        f'Your order #{order.order_number}',
+        render_to_string('orders/emails/order_placed.txt', {'order': order, 'items': items}),
+        settings.DEFAULT_FROM_EMAIL,
+        [order.email],
+    )
+
+
+@handler('order.placed')
+def notify_sellers(payload):
+    order = Order.objects.get(pk=payload['order_id'])
+    items = OrderItem.objects.filter(order=order, seller__isnull=False).select_related('seller')
+    by_seller = defaultdict(list)
+    for item in items:
+        by_seller[item.seller].append(item)
+    messages = [
+        EmailMessage(
+            f'New order #{order.order_number}',
+            render_to_string('orders/emails/seller_order.txt', {'order': order, 'items': seller_items}),
+            settings.DEFAULT_FROM_EMAIL,
+            [seller.email],
+        )
+        for seller, seller_items in by_seller.items()
+    ]
+    if messages:
+        get_connection().send_messages(messages)
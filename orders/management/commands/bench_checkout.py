@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from cart.cart import Cart
+from orders.services import create_order
+from shop.models import Brand, Category, Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure order creation (orders.services.create_order) for several cart sizes. '
+        'Runs in a transaction that is rolled back, nothing is kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('sizes', nargs='*', type=int, default=[1, 10, 100])
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        try:
+            with transaction.atomic():
+                self.run(sizes)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes):
+        user = get_user_model().objects.create_user(
+            username='bench-checkout', email='bench-checkout@example.com', password=None,
+        )
+        category = Category.objects.create(name='Bench checkout', slug='bench-checkout')
+        brand = Brand.objects.create(name='Bench checkout', slug='bench-checkout')
+        products = Product.objects.bulk_create([
+            Product(seller=user, category=category, brand=brand, name=f'Bench product {i}', slug=f'bench-product-{i}',
+                    price=10, stock=1000)
+            for i in range(max(sizes))
+        ])
+
+        for size in sizes:
+            request = RequestFactory().post('/')
+            request.user = user
+            request.session = SessionBase()
+            cart = Cart(request)
+            cart.storage.add_many(cart.key, {product.pk: 1 for product in products[:size]})
+
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                order = create_order(
+                    user, Cart(request), full_name='Bench', email=user.email, phone='-',
+                    postal_code='-', city='-', country='-', payment_method='bench', publish=False,
+                )
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(
+                f'{size:>5} items: {len(queries):>3} queries, {elapsed:8.2f} ms, order {order.order_number}'
+            )
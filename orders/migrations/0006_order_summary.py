@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:08
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_summary(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    items = OrderItem.objects.filter(order=OuterRef('pk'))
+    lead_item = items.order_by('id')
+    # One UPDATE for every order
+    Order.objects.update(
+        item_count=Coalesce(Subquery(
+            items.order_by().values('order').annotate(total=Sum('quantity')).values('total')
+        ), 0),
+        lead_item_name=Coalesce(Subquery(lead_item.values('product__name')[:1]), Value('')),
+        lead_item_image=Coalesce(Subquery(lead_item.values('product__image')[:1]), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_rename_address_line_1_to_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='lead_item_image',
+            field=models.ImageField(blank=True, upload_to='products/%Y/%m/%d'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='lead_item_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
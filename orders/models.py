@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from shop.models import Product
 import uuid
 
@@ -19,6 +20,10 @@ class Order(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     paid = models.BooleanField(default=False)
+    # Copied from the items when the order is created, so order lists need no join
+    item_count = models.PositiveIntegerField(default=0)
+    lead_item_name = models.CharField(max_length=200, blank=True)
+    lead_item_image = models.ImageField(upload_to='products/%Y/%m/%d', blank=True)
 
     class Meta:
         ordering = ('-created',)
@@ -37,9 +42,23 @@ class Order(models.Model):
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, related_name='order_items', on_delete=models.CASCADE)
+    # Kept when the product is deleted, the fields below still describe it
+    product = models.ForeignKey(Product, related_name='order_items', on_delete=models.SET_NULL, null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=1)
+    # Copied from the product and the order at checkout, so seller queries need no join
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='sold_items', on_delete=models.SET_NULL, null=True, blank=True,
+    )
+    product_name = models.CharField(max_length=200, default='')
+    product_slug = models.CharField(max_length=200, blank=True)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # A seller's sales, newest first, see dashboard.views.order_items
+            models.Index(fields=['seller', '-created', '-id'], name='orderitem_seller_created_idx'),
+        ]
 
     def __str__(self):
         return str(self.id)
@@ -0,0 +1,55 @@
+from django.db import transaction
+
+from inventory.services import consume_stock
+from outbox import events
+from .models import Order, OrderItem
+
+
+class EmptyCartError(Exception):
+    pass
+
+
+def create_order(user, cart, publish=True, **fields):
+    """
+    Create an order from every line of ``cart`` (a ``cart.cart.Cart``) and empty
+    the cart, all in one transaction.
+
+    The query count does not depend on the size of the cart: the cart lines and
+    their products are read once, the items are written with one bulk INSERT.
+    An ``order.placed`` outbox event is written in the same transaction, unless
+    ``publish`` is False.
+    Raises inventory.services.InsufficientStock, leaving nothing written, when
+    the stock does not cover the cart.
+    """
+    items = list(cart)
+    if not items:
+        raise EmptyCartError('The cart is empty.')
+
+    with transaction.atomic():
+        consume_stock(user, {item['product'].pk: item['quantity'] for item in items})
+        order = Order.objects.create(
+            user=user,
+            total_price=sum(item['total_price'] for item in items),
+            item_count=sum(item['quantity'] for item in items),
+            lead_item_name=items[0]['product'].name,
+            lead_item_image=items[0]['product'].image.name,
+            **fields,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item['product'],
+                price=item['price'],
+                quantity=item['quantity'],
+                seller_id=item['product'].seller_id,
+                product_name=item['product'].name,
+                product_slug=item['product'].slug,
+                created=order.created,
+            )
+            for item in items
+        ])
+        cart.clear()
+        # Emails and alerts are sent by the outbox worker, after the response
+        if publish:
+            events.publish('order.placed', {'order_id': order.pk})
+    return order
@@ -1,3 +1,134 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from shop.models import Brand, Category, Product
+from users.models import Address, User
+from . import admission
+from .admission import CheckoutBusy
+from .models import Order
+
+
+@override_settings(CHECKOUT_MAX_CONCURRENCY=2, CHECKOUT_PROCESS_CONCURRENCY=4, CHECKOUT_QUEUE_SIZE=10)
+class AdmissionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        admission._process_slots = None
+        self.addCleanup(cache.clear)
+
+    def busy(self, ticket=None):
+        with self.assertRaises(CheckoutBusy) as raised:
+            admission.admit(ticket)
+        return raised.exception
+
+    def test_full_checkout_hands_out_tickets_in_order(self):
+        slots = [admission.admit(), admission.admit()]
+        first, second = self.busy(), self.busy()
+        self.assertEqual((first.ticket, first.position), (1, 1))
+        self.assertEqual((second.ticket, second.position), (2, 2))
+        for slot in slots:
+            admission.release(slot)
+
+    def test_request_without_ticket_queues_behind_waiting_tickets(self):
+        slot = admission.admit()
+        admission.admit()
+        waiting = self.busy()
+
+        # The freed slot is reserved for the waiting ticket, a newcomer queues behind it
+        admission.release(slot)
+        newcomer = self.busy()
+        self.assertEqual(newcomer.ticket, waiting.ticket + 1)
+        self.assertGreater(newcomer.position, 0)
+        self.assertIsNotNone(admission.admit(waiting.ticket))
+
+    def test_granted_ticket_gets_its_slot(self):
+        slot = admission.admit()
+        admission.admit()
+        ticket = self.busy().ticket
+        self.assertEqual(admission.status(ticket), 1)
+
+        admission.release(slot)
+        self.assertEqual(admission.status(ticket), 0)
+        granted = admission._find_grant(ticket)
+        _, key, _ = admission.admit(ticket)
+        self.assertEqual(key, granted)
+        self.assertIsNone(admission._find_grant(ticket))
+
+    def test_dead_tickets_are_skipped(self):
+        slot = admission.admit()
+        admission.admit()
+        dead, alive = self.busy().ticket, self.busy().ticket
+        # Its holder stopped polling
+        cache.delete(admission._alive_key(dead))
+
+        admission.release(slot)
+        self.assertIsNone(admission._find_grant(dead))
+        self.assertIsNotNone(admission._find_grant(alive))
+        self.assertEqual(admission.status(alive), 0)
+        self.assertIsNotNone(admission.admit(alive))
+
+    def test_full_queue_gives_no_ticket(self):
+        admission.admit()
+        admission.admit()
+        with override_settings(CHECKOUT_QUEUE_SIZE=1):
+            self.assertIsNotNone(self.busy().ticket)
+            self.assertIsNone(self.busy().ticket)
+
+
+@override_settings(CHECKOUT_MAX_CONCURRENCY=1, CHECKOUT_PROCESS_CONCURRENCY=4)
+class CheckoutBusyResponseTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        admission._process_slots = None
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        seller = User.objects.create_user(username='seller', email='seller@example.com', password='p', is_seller=True)
+        self.product = Product.objects.create(
+            seller=seller, category=Category.objects.create(name='Shoes', slug='shoes'),
+            brand=Brand.objects.create(name='Acme', slug='acme'), name='Shoe', slug='shoe', price=10, stock=5,
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.api.post('/api/v1/cart/add_item/', {'product_id': self.product.pk, 'quantity': 1}, format='json')
+        # Someone else is checking out
+        self.slot = admission.admit()
+
+    def test_html_checkout(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['checkout_address'] = {
+            'full_name': 'Buyer', 'email': 'buyer@example.com', 'phone': '1', 'country': 'Country',
+            'city': 'City', 'postal_code': '1', 'address': '1 Main St',
+        }
+        session.save()
+
+        response = self.client.post('/orders/payment/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(admission.retry_after(1)))
+        self.assertEqual(self.client.session['checkout_ticket'], 1)
+        self.assertFalse(Order.objects.exists())
+
+        admission.release(self.slot)
+        self.assertTrue(self.client.get('/orders/payment/status/').json()['ready'])
+        self.assertEqual(self.client.post('/orders/payment/').status_code, 302)
+        self.assertTrue(Order.objects.exists())
+
+    def test_api_checkout(self):
+        address = Address.objects.create(
+            user=self.user, address_line_1='1 Main St', city='City', state='State', postal_code='1', country='Country',
+        )
+        order = {
+            'address_id': address.pk, 'full_name': 'Buyer', 'email': 'buyer@example.com', 'phone': '1',
+            'postal_code': '1', 'city': 'City', 'country': 'Country', 'payment_method': 'card',
+        }
+        response = self.api.post('/api/v1/orders/', order, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(admission.retry_after(1)))
+        self.assertEqual(response['X-Checkout-Ticket'], '1')
+        self.assertEqual(response.json()['position'], 1)
+
+        admission.release(self.slot)
+        response = self.api.post('/api/v1/orders/', order, format='json', HTTP_X_CHECKOUT_TICKET='1')
+        self.assertEqual(response.status_code, 201)
@@ -6,6 +6,8 @@ app_name = 'orders'
 urlpatterns = [
     path('create/', views.order_create, name='order_create'),
     path('payment/', views.payment_process, name='payment_process'),
+    path('payment/status/', views.checkout_status, name='checkout_status'),
     path('<int:order_id>/detail/', views.order_detail, name='order_detail'),
+    path('', views.order_list, name='order_list'),
     path('history/', views.order_history, name='order_history'),
 ]
\ No newline at end of file
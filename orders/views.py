@@ -1,15 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Prefetch
+from django.http import JsonResponse
 from cart.cart import Cart
 from .models import Order, OrderItem
 from .forms import OrderCreateForm
+from . import admission
+from .admission import CheckoutBusy, checkout_slot
+from .services import create_order
+from inventory.services import InsufficientStock, reserve_stock
 import uuid
 
 
 @login_required
 def order_create(request):
-    cart = Cart(request)
+    cart = Cart.for_request(request)
     if len(cart) == 0:
         messages.warning(request, 'Your cart is empty')
         return redirect('shop:product_list')
@@ -40,59 +46,105 @@ def order_create(request):
 
 @login_required
 def payment_process(request):
-    cart = Cart(request)
+    cart = Cart.for_request(request)
     address_data = request.session.get('checkout_address')
 
     if not address_data:
         messages.error(request, 'No address provided. Please complete the address form first.')
         return redirect('orders:order_create')
 
-    if request.method == 'POST':
-        # Simulate payment success
-        order = Order.objects.create(
-            user=request.user,
-            full_name=address_data['full_name'],
-            email=address_data['email'],
-            phone=address_data['phone'],
-            country=address_data['country'],
-            city=address_data['city'],
-            postal_code=address_data['postal_code'],
-            address=address_data['address'],
-            paid=True, # Simulate successful payment
-            payment_method='Card (Simulated)',
-            total_price=cart.get_total_price(),
-        )
-
-        for item in cart:
-            OrderItem.objects.create(
-                order=order,
-                product=item['product'],
-                price=item['price'],
-                quantity=item['quantity']
+    if len(cart) == 0:
+        messages.warning(request, 'Your cart is empty')
+        return redirect('shop:product_list')
+
+    try:
+        if request.method == 'POST':
+            with checkout_slot(request.session.get('checkout_ticket')):
+                # Simulate payment success
+                order = create_order(
+                    request.user,
+                    cart,
+                    full_name=address_data['full_name'],
+                    email=address_data['email'],
+                    phone=address_data['phone'],
+                    country=address_data['country'],
+                    city=address_data['city'],
+                    postal_code=address_data['postal_code'],
+                    address=address_data['address'],
+                    paid=True, # Simulate successful payment
+                    payment_method='Card (Simulated)',
+                )
+            del request.session['checkout_address']
+            request.session.pop('checkout_ticket', None)
+
+            messages.success(request, f'Payment successful! Your order #{order.order_number} has been created.')
+            return redirect('orders:order_detail', order_id=order.id)
+
+        # Hold the stock while the user is on the payment page
+        reserve_stock(request.user, cart.get_lines())
+    except InsufficientStock as e:
+        for shortage in e.shortages:
+            messages.error(
+                request,
+                f"Not enough stock for {shortage['name']}: {shortage['available']} left, {shortage['requested']} in your cart."
             )
+        return redirect('cart:cart_detail')
+    except CheckoutBusy as busy:
+        # Answer at once instead of holding a worker, the page retries by itself
+        request.session['checkout_ticket'] = busy.ticket
+        response = render(request, 'orders/checkout_busy.html', {'busy': busy}, status=429)
+        response['Retry-After'] = busy.retry_after
+        return response
 
-        cart.clear()
-        del request.session['checkout_address']
+    return render(request, 'orders/payment.html', {'cart': cart})
 
-        messages.success(request, f'Payment successful! Your order #{order.order_number} has been created.')
-        return redirect('orders:order_detail', order_id=order.id)
 
-    return render(request, 'orders/payment.html', {'cart': cart})
+@login_required
+def checkout_status(request):
+    """
+    Place of the user's checkout ticket in the queue, polled by the busy page.
+    """
+    ticket = request.session.get('checkout_ticket')
+    if ticket is None:
+        return JsonResponse({'ticket': None, 'position': 0, 'ready': True})
+    position = admission.status(ticket)
+    return JsonResponse({
+        'ticket': ticket,
+        'position': position,
+        'ready': position == 0,
+        'retry_after': admission.retry_after(position),
+    })
+
+
+def _items_with_products():
+    return Prefetch(
+        'items',
+        queryset=OrderItem.objects.select_related('product').only(
+            'order_id', 'price', 'quantity', 'product_name', 'product__slug', 'product__image',
+        ).order_by('id'),
+    )
 
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(
+        Order.objects.prefetch_related(_items_with_products()), id=order_id, user=request.user,
+    )
     return render(request, 'orders/detail.html', {'order': order})
 
 
 @login_required
 def order_list(request):
+    # Summary columns only, the items are not loaded
     orders = Order.objects.filter(user=request.user).order_by('-created')
     return render(request, 'orders/list.html', {'orders': orders})
 
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created')
+    # Two queries however many orders: the orders, then all their items with products
+    orders = (
+        Order.objects.filter(user=request.user).order_by('-created')
+        .prefetch_related(_items_with_products())
+    )
     return render(request, 'orders/history.html', {'orders': orders})
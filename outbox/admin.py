@@ -0,0 +1,20 @@
+from django.contrib import admin
+from .models import DeadLetterEvent, OutboxEvent
+from .worker import requeue
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'handler', 'attempts', 'available_at', 'locked_until']
+    list_filter = ['topic']
+    readonly_fields = ['created', 'last_error']
+
+@admin.register(DeadLetterEvent)
+class DeadLetterEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'handler', 'attempts', 'failed_at']
+    list_filter = ['topic', 'handler']
+    readonly_fields = ['created', 'failed_at', 'attempts', 'last_error']
+    actions = ['requeue_events']
+
+    @admin.action(description='Requeue selected events')
+    def requeue_events(self, request, queryset):
+        self.message_user(request, f'{requeue(queryset)} events requeued.')
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+# topic -> {handler name: function}
+_handlers = {}
+
+
+def handler(topic, name=None):
+    """
+    Register the decorated function as a handler of ``topic``. It is called
+    with the event payload by the outbox worker, at least once, so it must
+    cope with being run again for the same event.
+    """
+    def register(func):
+        _handlers.setdefault(topic, {})[name or f'{func.__module__}.{func.__qualname__}'] = func
+        return func
+    return register
+
+
+def get_handler(topic, name):
+    return _handlers.get(topic, {}).get(name)
+
+
+def publish(topic, payload, delay=0):
+    """
+    Queue ``topic`` for every handler registered for it, one row per handler
+    so each is retried on its own. Call it inside the transaction writing the
+    data the event is about: the event exists if and only if that commits.
+    """
+    handlers = _handlers.get(topic, {})
+    available_at = timezone.now() + timedelta(seconds=delay)
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(topic=topic, handler=name, payload=payload, available_at=available_at)
+        for name in handlers
+    ])
@@ -0,0 +1,39 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run the handlers of outbox events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Events claimed at a time (OUTBOX_BATCH_SIZE).')
+        parser.add_argument('--concurrency', type=int, help='Handlers run in parallel (OUTBOX_CONCURRENCY).')
+        parser.add_argument('--once', action='store_true', help='Stop once no event is due.')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to wait when no event is due.')
+
+    def handle(self, *args, **options):
+        worker = Worker(batch_size=options['batch_size'], concurrency=options['concurrency'])
+        self.stopping = False
+        # Finish the current batch on SIGTERM instead of dropping it
+        signal.signal(signal.SIGTERM, self.stop)
+        handled = 0
+        try:
+            while not self.stopping:
+                count = worker.run_batch()
+                handled += count
+                if not count:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.close()
+        self.stdout.write(f'Handled {handled} outbox events.')
+
+    def stop(self, signum, frame):
+        self.stopping = True
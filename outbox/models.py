@@ -0,0 +1,50 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    Work for one handler of an event, written in the transaction that made the
+    event happen and carried out later by `manage.py run_outbox_worker`.
+    """
+    topic = models.CharField(max_length=100)
+    handler = models.CharField(max_length=200)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    created = models.DateTimeField(auto_now_add=True)
+    # Not picked up before this time, pushed back after each failure
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    # Set while a worker holds the event, so no other worker takes it
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('available_at', 'id')
+        indexes = [
+            models.Index(fields=['available_at'], name='outbox_available_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} -> {self.handler} #{self.id}'
+
+
+class DeadLetterEvent(models.Model):
+    """
+    An outbox event whose handler kept failing. Requeue it from the admin
+    once the cause is fixed.
+    """
+    topic = models.CharField(max_length=100)
+    handler = models.CharField(max_length=200)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    created = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField()
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('-failed_at',)
+
+    def __str__(self):
+        return f'{self.topic} -> {self.handler} ({self.attempts} attempts)'
@@ -0,0 +1,138 @@
+"""
+Outbox worker: claims due events in batches and runs their handlers on a
+thread pool.
+
+A batch is claimed by setting ``locked_by``/``locked_until`` on up to
+``batch_size`` due events in one transaction (``SKIP LOCKED`` where the
+database has it), so several workers can run side by side. A worker that dies
+leaves its lease behind and the events are picked up again once it expires.
+Each event's lease is renewed right before its handler runs, so events still
+queued behind slow ones are not handled after another worker took them over.
+A failed event is retried with exponential backoff and moved to the dead
+letters after OUTBOX_MAX_ATTEMPTS attempts.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .events import get_handler
+from .models import DeadLetterEvent, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts):
+    """
+    Seconds to wait before the next attempt, doubling each time, with jitter so
+    failed events do not all come back at once.
+    """
+    delay = min(settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), settings.OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1)
+
+
+class Worker:
+
+    def __init__(self, batch_size=None, concurrency=None):
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.concurrency = concurrency or settings.OUTBOX_CONCURRENCY
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox')
+
+    def run_batch(self):
+        """
+        Claim and handle one batch. Returns the number of events handled.
+        """
+        events = self.claim()
+        if events:
+            list(self.executor.map(self.handle, events))
+        return len(events)
+
+    def claim(self):
+        now = timezone.now()
+        locked_until = now + timedelta(seconds=settings.OUTBOX_LEASE)
+        due = OutboxEvent.objects.filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now), available_at__lte=now,
+        )
+        with transaction.atomic():
+            ids = list(
+                due.select_for_update(skip_locked=True).order_by('available_at', 'id')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return []
+            # Still filtered on the lease, for databases without row locks
+            due.filter(id__in=ids).update(locked_by=self.name, locked_until=locked_until)
+        return list(OutboxEvent.objects.filter(id__in=ids, locked_by=self.name, locked_until=locked_until))
+
+    def handle(self, event):
+        close_old_connections()
+        if not self.renew(event):
+            logger.warning('Outbox event %s lease expired before it was handled, skipped', event)
+            return
+        func = get_handler(event.topic, event.handler)
+        try:
+            if func is None:
+                raise LookupError(f'No handler {event.handler} for {event.topic}.')
+            func(event.payload)
+        except Exception:
+            self.fail(event, traceback.format_exc())
+        else:
+            OutboxEvent.objects.filter(pk=event.pk, locked_by=self.name).delete()
+
+    def renew(self, event):
+        now = timezone.now()
+        return OutboxEvent.objects.filter(pk=event.pk, locked_by=self.name, locked_until__gt=now).update(
+            locked_until=now + timedelta(seconds=settings.OUTBOX_LEASE),
+        )
+
+    def fail(self, event, error):
+        attempts = event.attempts + 1
+        if attempts < settings.OUTBOX_MAX_ATTEMPTS:
+            logger.warning('Outbox event %s failed (attempt %s):\n%s', event, attempts, error)
+            OutboxEvent.objects.filter(pk=event.pk, locked_by=self.name).update(
+                attempts=attempts,
+                last_error=error,
+                available_at=timezone.now() + timedelta(seconds=backoff(attempts)),
+                locked_by='',
+                locked_until=None,
+            )
+            return
+        logger.error('Outbox event %s failed %s times, moved to dead letters:\n%s', event, attempts, error)
+        with transaction.atomic():
+            if OutboxEvent.objects.filter(pk=event.pk, locked_by=self.name).delete()[0]:
+                DeadLetterEvent.objects.create(
+                    topic=event.topic,
+                    handler=event.handler,
+                    payload=event.payload,
+                    created=event.created,
+                    attempts=attempts,
+                    last_error=error,
+                )
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        connections.close_all()
+
+
+def requeue(dead_letters):
+    """
+    Put dead letters back in the outbox, with their attempts reset.
+    """
+    with transaction.atomic():
+        dead_letters = list(dead_letters)
+        OutboxEvent.objects.bulk_create([
+            OutboxEvent(topic=dead.topic, handler=dead.handler, payload=dead.payload)
+            for dead in dead_letters
+        ])
+        DeadLetterEvent.objects.filter(id__in=[dead.id for dead in dead_letters]).delete()
+    return len(dead_letters)
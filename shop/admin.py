@@ -13,9 +13,10 @@ class BrandAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'brand', 'price', 'stock', 'available']
+    list_display = ['name', 'category', 'brand', 'price', 'stock', 'available', 'avg_rating', 'review_count']
     list_filter = ['available', 'category', 'brand']
     list_editable = ['price', 'stock', 'available']
+    readonly_fields = ['avg_rating', 'review_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name', 'description']
 
@@ -0,0 +1,69 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from cart.cart import Cart
+
+from .models import Product
+from .navigation import get_navigation_version
+from .wishlist import get_wishlist_product_ids
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def collection_fingerprint(queryset):
+    """
+    (last modified, row count) of a Product queryset, one aggregate query.
+
+    Any edit bumps ``updated`` and any insert/delete changes the count.
+    """
+    stats = queryset.order_by().aggregate(last_modified=Max('updated'), count=Count('id'))
+    return stats['last_modified'], stats['count']
+
+
+def wishlist_fingerprint(request):
+    return make_etag(*sorted(get_wishlist_product_ids(request))) if request.user.is_authenticated else None
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Return a 304 response when the request's validators still match, else None.
+    """
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    return get_conditional_response(request, etag=quote_etag(etag), last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+    # Content may depend on the user, make clients revalidate instead of sharing copies
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie', 'Authorization'))
+    return response
+
+
+def product_detail_etag(request, id, slug):
+    """
+    ETag for the product detail page, or None when the page must be rendered.
+
+    Covers the product and its reviews (``updated``), the similar products block,
+    the navigation menus and the per-user bits of the layout.
+    """
+    product = Product.objects.filter(id=id, slug=slug, available=True).values('updated', 'category_id').first()
+    if product is None or len(messages.get_messages(request)):
+        return None
+    similar = collection_fingerprint(Product.objects.filter(category_id=product['category_id'], available=True))
+    return make_etag(
+        'product', id, product['updated'], similar, get_navigation_version(),
+        request.user.pk, wishlist_fingerprint(request),
+        Cart.for_request(request).fingerprint(),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    )
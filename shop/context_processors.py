@@ -1,6 +1,5 @@
-from .models import Category, Brand
+from .navigation import get_navigation
 
 def extras(request):
-    categories = Category.objects.all()
-    brands = Brand.objects.all()
-    return {'categories': categories, 'brands': brands}
+    navigation = get_navigation()
+    return {'categories': navigation['categories'], 'brands': navigation['brands']}
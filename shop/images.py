@@ -0,0 +1,126 @@
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Longest edge in pixels of each variant
+VARIANTS = {
+    'thumbnail': 150,
+    'card': 400,
+    'detail': 1000,
+}
+# File extension -> Pillow format
+FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+QUALITY = 82
+# How long has_variants() remembers the answer of the storage
+EXISTS_TIMEOUT = 60 * 5
+
+logger = logging.getLogger(__name__)
+
+
+def variant_name(name, variant, ext):
+    """
+    Storage name of a variant, stored next to the original:
+    ``products/2025/10/14/shoe.png`` -> ``products/2025/10/14/shoe.png__card.webp``.
+    The original extension is kept so ``shoe.jpg`` gets variants of its own.
+    """
+    return f'{name}__{variant}.{ext}'
+
+
+def has_variants(field_file):
+    """
+    Whether the variants of ``field_file`` were generated. Checked on every
+    render, so the storage's answer is cached for a few minutes.
+    """
+    key = _exists_key(field_file.name)
+    exists = cache.get(key)
+    if exists is None:
+        exists = field_file.storage.exists(variant_name(field_file.name, 'thumbnail', 'jpg'))
+        cache.set(key, exists, EXISTS_TIMEOUT)
+    return exists
+
+
+def _exists_key(name):
+    return 'image-variants:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def generate_variants(field_file):
+    """
+    Write every variant of an uploaded image, replacing existing ones.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            original.load()
+
+    # JPEG has no alpha channel, flatten transparent images onto white
+    if original.mode in ('RGBA', 'LA') or (original.mode == 'P' and 'transparency' in original.info):
+        original = original.convert('RGBA')
+        background = Image.new('RGB', original.size, (255, 255, 255))
+        background.paste(original, mask=original.getchannel('A'))
+        original = background
+    elif original.mode != 'RGB':
+        original = original.convert('RGB')
+
+    for variant, size in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        for ext, image_format in FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=QUALITY, optimize=True)
+            name = variant_name(field_file.name, variant, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+    cache.set(_exists_key(field_file.name), True, EXISTS_TIMEOUT)
+
+
+def ensure_variants(field_file):
+    if not field_file or has_variants(field_file):
+        return
+    try:
+        generate_variants(field_file)
+    except (OSError, Image.DecompressionBombError):
+        # A broken upload must not break saving the model; without variants
+        # the URL helpers below serve the original
+        logger.warning('Could not generate variants for %s', field_file.name, exc_info=True)
+
+
+def variant_url(field_file, variant, ext='jpg'):
+    if not field_file:
+        return None
+    if not has_variants(field_file):
+        return field_file.url
+    return field_file.storage.url(variant_name(field_file.name, variant, ext))
+
+
+def variant_urls(field_file):
+    """
+    ``{variant: {'width': ..., 'webp': url, 'jpg': url}}``. Until the variants
+    exist every URL is the original's, with no width.
+    """
+    if not field_file:
+        return {}
+    if not has_variants(field_file):
+        return {variant: {'width': None, **{ext: field_file.url for ext in FORMATS}} for variant in VARIANTS}
+    return {
+        variant: {'width': size, **{ext: variant_url(field_file, variant, ext) for ext in FORMATS}}
+        for variant, size in VARIANTS.items()
+    }
+
+
+def srcset(field_file, ext='jpg'):
+    if not field_file:
+        return ''
+    if not has_variants(field_file):
+        return field_file.url
+    return ', '.join(
+        f'{variant_url(field_file, variant, ext)} {size}w' for variant, size in VARIANTS.items()
+    )
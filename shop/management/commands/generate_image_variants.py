@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from shop.images import generate_variants, has_variants
+from shop.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for product images and profile pictures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist.')
+
+    def handle(self, *args, **options):
+        sources = [
+            (Product.objects.exclude(image=''), 'image'),
+            (User.objects.exclude(profile_picture=''), 'profile_picture'),
+        ]
+        generated = failed = 0
+        for queryset, field in sources:
+            for obj in queryset.only('pk', field).iterator(chunk_size=500):
+                field_file = getattr(obj, field)
+                if not options['force'] and has_variants(field_file):
+                    continue
+                try:
+                    generate_variants(field_file)
+                except OSError as exc:
+                    failed += 1
+                    self.stderr.write(f'{field_file.name}: {exc}')
+                    continue
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {generated} images, {failed} failed.'))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    Wishlist = apps.get_model('shop', 'Wishlist')
+    duplicates = (
+        Wishlist.objects.order_by().values('user_id', 'product_id')
+        .annotate(first_id=Min('id'), rows=Count('id')).filter(rows__gt=1)
+    )
+    for row in duplicates:
+        Wishlist.objects.filter(user_id=row['user_id'], product_id=row['product_id']).exclude(
+            id=row['first_id']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_product_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wishlist',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_wishlist_product'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_wishlist_unique_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_sharded',
+            field=models.BooleanField(default=False),
+        ),
+    ]
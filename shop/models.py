@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.conf import settings
 
@@ -45,13 +45,34 @@ class Product(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
+    # Stock split across inventory.StockShard rows for hot products, see inventory/shards.py
+    stock_sharded = models.BooleanField(default=False)
     available = models.BooleanField(default=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    # Review aggregates, maintained by shop/ratings.py
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ('name',)
-        indexes = [models.Index(fields=['id', 'slug'])]
+        indexes = [
+            models.Index(fields=['id', 'slug']),
+            # Keyset pagination seeks, see shop/pagination.py
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['avg_rating', 'id']),
+            # Seller dashboard, see dashboard.views.product_list
+            models.Index(fields=['seller', 'name', 'id'], name='product_seller_name_idx'),
+            models.Index(fields=['seller', 'price', 'id'], name='product_seller_price_idx'),
+            models.Index(fields=['seller', 'created', 'id'], name='product_seller_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -59,6 +80,27 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('shop:product_detail', args=[self.id, self.slug])
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The navigation menu lists brands per category, see shop/signals.py
+        instance._nav_key = (instance.__dict__.get('category_id'), instance.__dict__.get('brand_id'))
+        return instance
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}') for star in range(1, 6)}
+
+    @property
+    def available_stock(self):
+        """
+        Units in stock. Read this instead of ``stock``, which is only refreshed
+        by the rebalancer while the stock is sharded.
+        """
+        if not self.stock_sharded:
+            return self.stock
+        return sum(shard.count for shard in self.stock_shards.all())
+
 
 class Review(models.Model):
     RATING_CHOICES = (
@@ -79,10 +121,27 @@ class Review(models.Model):
     def __str__(self):
         return f'Review by {self.user} on {self.product}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the product aggregates were built from, see shop/signals.py
+        instance._counted_rating = (instance.__dict__.get('product_id'), instance.__dict__.get('rating'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The rating aggregates are updated from post_save, keep both in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Wishlist(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_wishlist_product'),
+        ]
+
     def __str__(self):
         return f"{self.user}'s wishlist"
\ No newline at end of file
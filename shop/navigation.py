@@ -0,0 +1,75 @@
+import time
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import Brand, Category, Product
+
+VERSION_KEY = 'shop:navigation:version'
+DATA_KEY = 'shop:navigation:{version}'
+DATA_TIMEOUT = 60 * 60 * 24
+# Seconds a process reuses its own copy before looking again
+LOCAL_TIMEOUT = 60
+
+# (version, data, monotonic load time) of the last navigation this process loaded
+_local = (None, None, 0)
+
+
+def get_navigation_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_navigation():
+    """
+    Categories and brands for the site-wide menus.
+
+    Served from process memory while the shared version key is unchanged, then
+    from the shared cache, and only rebuilt from the database after a bump.
+
+    Bumps only reach other workers through a shared cache (Redis/Memcached).
+    With a per-process backend such as LocMemCache each process rebuilds from
+    the database every LOCAL_TIMEOUT seconds instead, so menus are at most
+    that stale.
+    """
+    global _local
+    version = get_navigation_version()
+
+    local_version, data, loaded = _local
+    if local_version == version and data is not None and time.monotonic() - loaded < LOCAL_TIMEOUT:
+        return data
+
+    key = DATA_KEY.format(version=version)
+    data = cache.get(key) if _shared_cache() else None
+    if data is None:
+        data = _load_navigation()
+        cache.set(key, data, DATA_TIMEOUT)
+    _local = (version, data, time.monotonic())
+    return data
+
+
+def _shared_cache():
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _load_navigation():
+    categories = list(Category.objects.all())
+    brands = list(Brand.objects.all())
+    brands_by_id = {brand.id: brand for brand in brands}
+    pairs = Product.objects.order_by().values_list('category_id', 'brand_id').distinct()
+    category_brands = {}
+    for category_id, brand_id in pairs:
+        category_brands.setdefault(category_id, []).append(brands_by_id[brand_id])
+    for category in categories:
+        category.nav_brands = sorted(category_brands.get(category.id, []), key=lambda brand: brand.name)
+    return {'categories': categories, 'brands': brands}
+
+
+def invalidate_navigation():
+    # Every worker sees the new version on its next request and reloads once
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
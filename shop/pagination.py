@@ -0,0 +1,184 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+# Ordering per catalog sort option; the last field must be unique so every
+# row has a distinct position.
+SORT_ORDERINGS = {
+    'name': ('name', 'id'),
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+    'rating': ('-avg_rating', '-id'),
+    'relevance': ('search_rank', 'id'),
+}
+
+
+def get_sort_key(sort_by, search_query=None):
+    # Search results default to relevance, everything else to name
+    if not sort_by:
+        sort_by = 'relevance' if search_query else 'name'
+    if sort_by not in SORT_ORDERINGS or (sort_by == 'relevance' and not search_query):
+        sort_by = 'name'
+    return sort_by
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position, reverse=False):
+    payload = {'p': [_dump(value) for value in position]}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload['p'], list):
+            raise InvalidCursor(cursor)
+        return payload['p'], bool(payload.get('r'))
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+
+
+def _dump(value):
+    if isinstance(value, Decimal):
+        return {'d': str(value)}
+    if isinstance(value, datetime):
+        return {'t': value.isoformat()}
+    return value
+
+
+def _load(value, field):
+    """
+    Convert a decoded cursor value with the model ``field`` of its column.
+    Values that would not be encoded back the same way are rejected.
+    """
+    raw = value
+    if isinstance(value, dict):
+        value = value.get('d', value.get('t'))
+    if value is None or isinstance(value, (list, dict)):
+        raise InvalidCursor(raw)
+    try:
+        value = field.to_python(value)
+    except ValidationError:
+        raise InvalidCursor(raw)
+    if _dump(value) != raw:
+        raise InvalidCursor(raw)
+    return value
+
+
+class KeysetPage:
+    """
+    One page of a keyset paginated queryset.
+
+    Iterating yields the objects, ``next_cursor``/``previous_cursor`` are opaque
+    strings (or None) to pass back as ``?cursor=``.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over ``ordering``: each page is a ``WHERE (k1, k2) > (...)
+    ORDER BY k1, k2 LIMIT n`` query, so page N costs the same as page 1 and no
+    COUNT(*) is issued.
+    """
+
+    def __init__(self, queryset, ordering, per_page=20):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+
+    def get_page(self, cursor=None):
+        """
+        Return the page for ``cursor``, falling back to the first page when the
+        cursor is missing or malformed.
+        """
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+    def page(self, cursor=None):
+        position, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if position is not None and len(position) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        if position is not None:
+            position = self._clean(position)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(_flip(field) for field in ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(ordering, position))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = encode_cursor(self._position(rows[-1]))
+            if (has_more and reverse) or (position is not None and not reverse):
+                previous_cursor = encode_cursor(self._position(rows[0]), reverse=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _clean(self, position):
+        # Cursors come from the client: a tampered one must not reach the query
+        return [_load(value, self._field(field.lstrip('-'))) for field, value in zip(self.ordering, position)]
+
+    def _field(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    def _position(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    @staticmethod
+    def _seek(ordering, position):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND (b > y OR (b = y AND c > z)))
+        condition = Q()
+        for field, value in reversed(list(zip(ordering, position))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            condition = after if not condition else after | (Q(**{name: value}) & condition)
+        return condition
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else '-' + field
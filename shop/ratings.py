@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Now, Round
+
+from .models import Product, Review
+
+STARS = range(1, 6)
+
+
+def apply_rating(product_id, rating, delta):
+    """
+    Add (delta=1) or withdraw (delta=-1) one ``rating`` from a product's aggregates
+    in a single UPDATE.
+    """
+    # Right-hand sides of an UPDATE see the old row, so derive the new average from it
+    rating_sum = sum((F(f'rating_{star}') * star for star in STARS), Value(0))
+    new_count = F('review_count') + delta
+    avg = Round(Cast(rating_sum + rating * delta, FloatField()) / new_count, 2)
+    Product.objects.filter(pk=product_id).update(**{
+        f'rating_{rating}': F(f'rating_{rating}') + delta,
+        'review_count': new_count,
+        'avg_rating': Case(When(review_count=-delta, then=Value(0.0)), default=avg, output_field=FloatField()),
+        # Reviews are part of the product's representation, so they move its validators
+        'updated': Now(),
+    })
+
+
+def touch_product(product_id):
+    """
+    Mark a product as changed without touching its aggregates (e.g. a review's text was edited).
+    """
+    Product.objects.filter(pk=product_id).update(updated=Now())
+
+
+def recompute_ratings(batch_size=500):
+    """
+    Rebuild every product's aggregates from the Review table.
+
+    Returns the number of products that have reviews.
+    """
+    stats = Review.objects.order_by().values('product_id').annotate(
+        review_count=Count('id'),
+        **{f'rating_{star}': Count('id', filter=Q(rating=star)) for star in STARS},
+    )
+    fields = ['avg_rating', 'review_count'] + [f'rating_{star}' for star in STARS]
+    updated = 0
+    with transaction.atomic():
+        Product.objects.update(avg_rating=0, review_count=0, **{f'rating_{star}': 0 for star in STARS})
+        batch = []
+        for row in stats.iterator(chunk_size=batch_size):
+            product = Product(pk=row.pop('product_id'), **row)
+            total = sum(star * row[f'rating_{star}'] for star in STARS)
+            product.avg_rating = round(total / product.review_count, 2)
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+        Product.objects.bulk_update(batch, fields)
+        updated += len(batch)
+    return updated
@@ -0,0 +1,128 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+DEFAULT_BACKEND = 'shop.search.SQLiteFTS5Backend'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    """
+    Interface for product search backends.
+
+    ``search`` narrows a Product queryset to the matches and annotates each
+    row with ``search_rank`` (lower is more relevant).
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index(self, product):
+        pass
+
+    def index_many(self, products):
+        for product in products:
+            self.index(product)
+
+    def remove(self, product_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Fallback without an index: plain ``icontains`` matching.
+    """
+
+    def search(self, queryset, query):
+        terms = TOKEN_RE.findall(query)
+        if not terms:
+            return queryset.none()
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(description__icontains=term)
+        # No relevance signal here, rank is constant so ordering falls back to id.
+        return queryset.filter(condition).annotate(search_rank=Value(0.0))
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    SQLite FTS5 index over product name and description.
+
+    The index lives in an external virtual table whose rowid is the product id,
+    the table is created by ``shop/migrations/0004_product_search_index.py``.
+    """
+    table = 'shop_product_fts'
+    # bm25 column weights: a hit in the name counts more than in the description.
+    weights = (10.0, 1.0)
+
+    def build_match(self, query):
+        terms = TOKEN_RE.findall(query)
+        # Quote every term so user input can't inject FTS syntax, and match as prefix.
+        return ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return queryset.none()
+        product_table = Product._meta.db_table
+        ids_sql = f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s'
+        rank_sql = (
+            f'SELECT bm25({self.table}, %s, %s) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND {self.table}.rowid = {product_table}.id'
+        )
+        return queryset.filter(
+            id__in=RawSQL(ids_sql, (match,))
+        ).annotate(
+            search_rank=RawSQL(rank_sql, (*self.weights, match), output_field=FloatField())
+        )
+
+    def index(self, product):
+        self.index_many([product])
+
+    def index_many(self, products):
+        rows = [(p.pk, p.name, p.description) for p in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, name, description) VALUES (%s, %s, %s)', rows
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) '
+                f'SELECT id, name, description FROM {Product._meta.db_table}'
+            )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    backend_path = getattr(settings, 'SHOP_SEARCH_BACKEND', DEFAULT_BACKEND)
+    if backend_path == DEFAULT_BACKEND and connection.vendor != 'sqlite':
+        backend_path = 'shop.search.DatabaseSearchBackend'
+    return import_string(backend_path)()
+
+
+def search_products(queryset, query):
+    """
+    Filter ``queryset`` down to products matching ``query`` and annotate ``search_rank``.
+    """
+    return get_search_backend().search(queryset, query)
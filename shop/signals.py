@@ -0,0 +1,70 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .images import ensure_variants
+from .models import Brand, Category, Product, Review
+from .navigation import invalidate_navigation
+from .ratings import apply_rating, touch_product
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.product_id, instance.rating)
+    previous = None if created else getattr(instance, '_counted_rating', None)
+    if previous == current:
+        touch_product(instance.product_id)
+        return
+    if previous and None not in previous:
+        apply_rating(*previous, delta=-1)
+    apply_rating(*current, delta=1)
+    instance._counted_rating = current
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    counted = getattr(instance, '_counted_rating', (instance.product_id, instance.rating))
+    if None not in counted:
+        apply_rating(*counted, delta=-1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def bump_navigation(sender, **kwargs):
+    invalidate_navigation()
+
+
+@receiver(post_save, sender=Product)
+def bump_navigation_for_product(sender, instance, created, raw=False, **kwargs):
+    nav_key = (instance.category_id, instance.brand_id)
+    if created or nav_key != getattr(instance, '_nav_key', None):
+        invalidate_navigation()
+    instance._nav_key = nav_key
+
+
+@receiver(post_delete, sender=Product)
+def bump_navigation_for_deleted_product(sender, **kwargs):
+    invalidate_navigation()
+
+
+@receiver(post_save, sender=Product)
+def make_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ensure_variants(instance.image)
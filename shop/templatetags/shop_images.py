@@ -0,0 +1,31 @@
+from django import template
+from django.utils.html import format_html
+
+from shop import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, variant='card', sizes='100vw', alt='', css_class='', placeholder=''):
+    """
+    ``<picture>`` with WebP and JPEG ``srcset``s of an image's variants,
+    ``variant`` being the fallback ``src``.
+    """
+    if not image:
+        return format_html('<img src="{}" class="{}" alt="{}">', placeholder, css_class, alt)
+    if not images.has_variants(image):
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', image.url, css_class, alt)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy">'
+        '</picture>',
+        images.srcset(image, 'webp'), sizes,
+        images.variant_url(image, variant), images.srcset(image), sizes, css_class, alt,
+    )
+
+
+@register.filter
+def variant(image, name):
+    return images.variant_url(image, name) or ''
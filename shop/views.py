@@ -1,11 +1,15 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
-from django.db.models import Q, Count, Avg
+from django.db.models import Count, Avg
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
 from .models import Product, Category, Brand, Review, Wishlist
+from .conditional import not_modified, product_detail_etag, set_validators
 from .forms import ReviewForm
+from .navigation import get_navigation
+from .pagination import KeysetPaginator, SORT_ORDERINGS, get_sort_key
+from .search import search_products
+from .wishlist import get_wishlist_product_ids, toggle_wishlist_item
 import django_filters
 
 
@@ -21,11 +25,9 @@ class ProductFilter(django_filters.FilterSet):
 
 def product_list(request, category_slug=None):
     category = None
-    categories = Category.objects.all()
+    categories = get_navigation()['categories']
     products = Product.objects.filter(available=True)
-    wishlist_product_ids = []
-    if request.user.is_authenticated:
-        wishlist_product_ids = list(Wishlist.objects.filter(user=request.user).values_list('product_id', flat=True))
+    wishlist_product_ids = get_wishlist_product_ids(request)
 
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
@@ -34,28 +36,16 @@ def product_list(request, category_slug=None):
     # Search
     search_query = request.GET.get('q')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
 
     # Filters
     product_filter = ProductFilter(request.GET, queryset=products)
     products = product_filter.qs
 
-    # Sorting
-    sort_by = request.GET.get('sort', 'name')
-    if sort_by == 'price_asc':
-        products = products.order_by('price')
-    elif sort_by == 'price_desc':
-        products = products.order_by('-price')
-    else:
-        products = products.order_by('name')
-
-    # Pagination
-    paginator = Paginator(products, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Sorting and keyset pagination
+    sort_by = get_sort_key(request.GET.get('sort'), search_query)
+    paginator = KeysetPaginator(products, SORT_ORDERINGS[sort_by], per_page=20)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'category': category,
@@ -63,27 +53,33 @@ def product_list(request, category_slug=None):
         'page_obj': page_obj,
         'filter': product_filter,
         'search_query': search_query,
+        'sort_by': sort_by,
         'wishlist_product_ids': wishlist_product_ids,
     }
     return render(request, 'shop/product/list.html', context)
 
 
 def product_detail(request, id, slug):
+    # Answer revalidations with 304 before loading or rendering anything
+    etag = product_detail_etag(request, id, slug)
+    if etag:
+        response = not_modified(request, etag)
+        if response:
+            return response
+
     product = get_object_or_404(Product, id=id, slug=slug, available=True)
 
     # Получаем отзывы
-    reviews = product.reviews.all()
+    reviews = product.reviews.select_related('user')
 
     # Похожие товары
     similar_products = Product.objects.filter(
-        category=product.category,
+        category_id=product.category_id,
         available=True
     ).exclude(id=product.id)[:8]
 
     # Проверка наличия в избранном
-    in_wishlist = False
-    if request.user.is_authenticated:
-        in_wishlist = Wishlist.objects.filter(user=request.user, product=product).exists()
+    in_wishlist = product.id in get_wishlist_product_ids(request)
 
     # Форма отзыва
     review_form = ReviewForm()
@@ -99,7 +95,10 @@ def product_detail(request, id, slug):
         'review_form': review_form,
         'user_has_reviewed': user_has_reviewed,
     }
-    return render(request, 'shop/product/detail.html', context)
+    response = render(request, 'shop/product/detail.html', context)
+    if etag:
+        set_validators(response, etag)
+    return response
 
 
 @login_required
@@ -127,13 +126,11 @@ def add_review(request, product_id):
 @login_required
 def toggle_wishlist(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    wishlist_item, created = Wishlist.objects.get_or_create(user=request.user, product=product)
 
-    if not created:
-        wishlist_item.delete()
-        messages.success(request, 'Товар удален из избранного')
-    else:
+    if toggle_wishlist_item(request.user, product):
         messages.success(request, 'Товар добавлен в избранное')
+    else:
+        messages.success(request, 'Товар удален из избранного')
 
     return redirect(request.META.get('HTTP_REFERER', 'shop:product_list'))
 
@@ -147,33 +144,21 @@ def wishlist_view(request):
 def product_list_by_brand(request, brand_slug):
     brand = get_object_or_404(Brand, slug=brand_slug)
     products = Product.objects.filter(brand=brand, available=True)
-    categories = Category.objects.all()
+    categories = get_navigation()['categories']
 
     # Search
     search_query = request.GET.get('q')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
 
     # Filters
     product_filter = ProductFilter(request.GET, queryset=products)
     products = product_filter.qs
 
-    # Sorting
-    sort_by = request.GET.get('sort', 'name')
-    if sort_by == 'price_asc':
-        products = products.order_by('price')
-    elif sort_by == 'price_desc':
-        products = products.order_by('-price')
-    else:
-        products = products.order_by('name')
-
-    # Pagination
-    paginator = Paginator(products, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Sorting and keyset pagination
+    sort_by = get_sort_key(request.GET.get('sort'), search_query)
+    paginator = KeysetPaginator(products, SORT_ORDERINGS[sort_by], per_page=20)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'brand': brand,
@@ -181,5 +166,6 @@ def product_list_by_brand(request, brand_slug):
         'page_obj': page_obj,
         'filter': product_filter,
         'search_query': search_query,
+        'sort_by': sort_by,
     }
     return render(request, 'shop/product/list.html', context)
@@ -0,0 +1,47 @@
+from django.db import IntegrityError, transaction
+
+from .models import Wishlist
+
+
+def get_wishlist_product_ids(request):
+    """
+    Ids of the products in the current user's wishlist.
+
+    Loaded with one query and memoized on the request, so every view helper and
+    serializer instance in the same request shares the set.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    # DRF wraps the HttpRequest, keep the set on the underlying one
+    http_request = getattr(request, '_request', request)
+    product_ids = getattr(http_request, '_wishlist_product_ids', None)
+    if product_ids is None:
+        product_ids = frozenset(Wishlist.objects.filter(user=user).values_list('product_id', flat=True))
+        http_request._wishlist_product_ids = product_ids
+    return product_ids
+
+
+def add_to_wishlist(user, product):
+    """
+    Add a product to the user's wishlist with a single INSERT, the unique
+    constraint rejects duplicates. Returns whether a row was inserted.
+    """
+    try:
+        with transaction.atomic():
+            Wishlist.objects.create(user=user, product=product)
+    except IntegrityError:
+        return False
+    return True
+
+
+def toggle_wishlist_item(user, product):
+    """
+    Remove the product from the wishlist if it is there, otherwise add it.
+    Returns True if the product is in the wishlist afterwards.
+    """
+    deleted, _ = Wishlist.objects.filter(user=user, product=product).delete()
+    if deleted:
+        return False
+    add_to_wishlist(user, product)
+    return True
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from shop.images import ensure_variants
+
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def make_profile_picture_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ensure_variants(instance.profile_picture)